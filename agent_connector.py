@@ -1,18 +1,32 @@
-import base64
-from multiprocessing.sharedctypes import Value
-
-import cv2
-
 import pysoarlib as psl
 import Python_sml_ClientInterface as sml
 
+from command_broker import CommandBroker
+from frame_transport import make_frame_transport
+from input_schema import InputLinkWriter
+from latency import NULL_LATENCY_TRACKER
+from vision_preprocessor import VisionPreprocessor
+
 
 class AgentConnector(psl.AgentConnector):
-    def __init__(self, agent: psl.SoarClient):
+    def __init__(self, agent: psl.SoarClient, frame_transport="png", vision_preprocessor: VisionPreprocessor = None):
         super().__init__(agent)
         self.agent = agent
         self.gui = None
+        self.action_handler = None
+        self.observation_pump = None
+        self.recorder = None
+        self.broker = CommandBroker(agent)
+        self.latency = NULL_LATENCY_TRACKER
         self.agent.execute_command("svs --enable")
+        self.vision_preprocessor = vision_preprocessor if vision_preprocessor is not None else VisionPreprocessor()
+        if frame_transport == "shm":
+            self.frame_transport = make_frame_transport(frame_transport, agent, max_frame_shape=self.vision_preprocessor.output_shape,
+                                                        dtype=self.vision_preprocessor.dtype)
+        else:
+            self.frame_transport = make_frame_transport(frame_transport, agent)
+        # Fail now rather than on the first frame, e.g. for float16 or two-channel frames over PNG
+        self.frame_transport.check_frame_layout(self.vision_preprocessor.output_shape, self.vision_preprocessor.dtype)
 
         self.first_input = True
 
@@ -20,81 +34,85 @@ class AgentConnector(psl.AgentConnector):
         self.vision_update_num = 0
         self.new_vision_update_wme = psl.SoarWME("vision-update", self.vision_update_num)
 
-        self.time_alive = 0
-        self.time_alive_wme = psl.SoarWME("time-alive", self.time_alive)
-
-        self.x_pos = 0.0
-        self.x_pos_wme = psl.SoarWME("x-pos", self.x_pos)
-        
-        self.y_pos = 0.0
-        self.y_pos_wme = psl.SoarWME("y-pos", self.y_pos)
-        
-        self.z_pos = 0.0
-        self.z_pos_wme = psl.SoarWME("z-pos", self.z_pos)
-        
-        self.pitch = 0.0
-        self.pitch_wme = psl.SoarWME("pitch", self.pitch)
-        
-        self.yaw = 0.0
-        self.yaw_wme = psl.SoarWME("yaw", self.yaw)
-        
-        self.world_time = 0
-        self.world_time_wme = psl.SoarWME("world-time", self.world_time)
+        self.input_writer = InputLinkWriter()
+        # Published before the first input phase so the VOG is created at the injected resolution
+        self.input_writer.update({"Vision": self.vision_preprocessor.resolution()})
+        self.last_observation = {}
+
+    @property
+    def latency(self):
+        return self._latency
+
+    @latency.setter
+    def latency(self, latency):
+        # The broker times the print queries it runs for subscribers
+        self._latency = latency
+        self.broker.latency = latency
 
     def send_vision(self, visual):
-        success, data = cv2.imencode('.png', visual)
-        obs_data_b64 = base64.b64encode(data).decode()
-        inject_cmd_str = f"svs vsm.inject {obs_data_b64}"
-        self.agent.execute_command(inject_cmd_str)
+        if self.recorder is not None:
+            self.recorder.record_frame(visual)
+        with self.latency.span("send-vision"):
+            self.frame_transport.send(self.vision_preprocessor.process(visual))
         self.new_vision_update = True
         self.vision_update_num += 1
 
     def update_info(self, info_dict):
-        self.time_alive = info_dict["TimeAlive"]
-        self.x_pos = info_dict["XPos"]
-        self.y_pos = info_dict["YPos"]
-        self.z_pos = info_dict["ZPos"]
-        self.pitch = info_dict["Pitch"]
-        self.yaw = info_dict["Yaw"]
-        self.world_time = info_dict["WorldTime"]
+        if self.recorder is not None:
+            self.recorder.record_observation(info_dict)
+        self.input_writer.update(info_dict)
+        self.last_observation = info_dict
+
+    def current_pose(self):
+        """Returns the agent's `(x, y, z, yaw, pitch)` from the latest observation."""
+        return tuple(self.last_observation.get(key, 0.0) for key in ["XPos", "YPos", "ZPos", "Yaw", "Pitch"])
+
+    def poll_observation_pump(self):
+        observation = self.observation_pump.take_observation()
+        if observation is not None:
+            self.update_info(observation)
+
+        frame = self.observation_pump.take_frame()
+        if frame is not None:
+            if self.gui is not None:
+                self.gui.update_observation(frame)
+            else:
+                self.send_vision(frame)
 
     def on_input_phase(self, input_link):
+        self.latency.mark_cycle()
+        self.broker.new_cycle()
+        if self.observation_pump is not None:
+            self.poll_observation_pump()
+
+        with self.latency.span("input-wmes"):
+            self._update_input_wmes(input_link)
+
+        self.broker.publish()
+
+    def _update_input_wmes(self, input_link):
         if self.new_vision_update:
             self.new_vision_update_wme.set_value(self.vision_update_num)
             self.new_vision_update_wme.update_wm(input_link)
             self.new_vision_update = False
 
-        self.time_alive_wme.set_value(self.time_alive)
-        self.time_alive_wme.update_wm(input_link)
-        
-        self.x_pos_wme.set_value(self.x_pos)
-        self.x_pos_wme.update_wm(input_link)
-
-        self.y_pos_wme.set_value(self.y_pos)
-        self.y_pos_wme.update_wm(input_link)
-
-        self.z_pos_wme.set_value(self.z_pos)
-        self.z_pos_wme.update_wm(input_link)
-
-        self.pitch_wme.set_value(self.pitch)
-        self.pitch_wme.update_wm(input_link)
-
-        self.yaw_wme.set_value(self.yaw)
-        self.yaw_wme.update_wm(input_link)
-
-        self.world_time_wme.set_value(self.world_time)
-        self.world_time_wme.update_wm(input_link)
-
-        state_text = self.agent.execute_command("p s1 -d 6", False)
-        vog_text = self.agent.execute_command("p v6 -d 4", False)
-        self.gui._soar_state_viewer_callback(state_text, vog_text)
+        self.input_writer.write(input_link)
 
     def on_output_event(self, command_name, root_id):
-        print(f"output event: {command_name}")
+        with self.latency.span("output-event"):
+            return self._handle_output_event(command_name, root_id)
+
+    def _handle_output_event(self, command_name, root_id):
+        if self.gui is not None:
+            print(f"output event: {command_name}")
         if command_name == "take-action":
             action_str = root_id.GetParameterValue("action-str")
-            print(f"\taction string: {action_str}")
-        if self.gui is not None:
-            self.gui.perform_action(action_str)
-            root_id.AddStatusComplete()
+            if self.gui is not None:
+                print(f"\taction string: {action_str}")
+            if self.recorder is not None:
+                self.recorder.record_action(action_str)
+            if self.action_handler is not None:
+                with self.latency.span("perform-action"):
+                    self.action_handler(action_str)
+                root_id.AddStatusComplete()
         return super().on_output_event(command_name, root_id)
\ No newline at end of file
@@ -0,0 +1,58 @@
+from argparse import ArgumentParser
+import time
+
+import numpy as np
+
+from frame_transport import FRAME_TRANSPORTS, make_frame_transport
+
+
+class NullAgent(object):
+    """Stands in for a SoarClient, only tallying the size of the commands it is sent."""
+    def __init__(self):
+        self.num_commands = 0
+        self.command_bytes = 0
+
+    def execute_command(self, cmd, print_res=False):
+        self.num_commands += 1
+        self.command_bytes += len(cmd)
+        return ""
+
+
+def bench_transport(name, frames, duration):
+    agent = NullAgent()
+    kwargs = {"max_frame_shape": frames[0].shape} if name == "shm" else {}
+    transport = make_frame_transport(name, agent, **kwargs)
+    transport.attach()
+    try:
+        num_frames = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            transport.send(frames[num_frames % len(frames)])
+            num_frames += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        transport.close()
+
+    return {
+        "transport": name,
+        "frames": num_frames,
+        "seconds": elapsed,
+        "frames_per_sec": num_frames / elapsed,
+        "command_bytes_per_frame": agent.command_bytes / max(agent.num_commands, 1),
+    }
+
+
+if __name__ == "__main__":
+    cli = ArgumentParser(description="Compares frames/sec of the PNG and shared memory frame transports.")
+    cli.add_argument("-d", "--duration", default=3.0, type=float, help="Seconds to run each transport for.")
+    cli.add_argument("--rows", default=480, type=int)
+    cli.add_argument("--cols", default=640, type=int)
+    cli_namespace = cli.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (cli_namespace.rows, cli_namespace.cols, 4), dtype=np.uint8) for _ in range(8)]
+
+    for name in FRAME_TRANSPORTS:
+        result = bench_transport(name, frames, cli_namespace.duration)
+        print(f"{result['transport']:>4}: {result['frames_per_sec']:9.1f} frames/sec, "
+              f"{result['command_bytes_per_frame']:11.0f} command bytes/frame")
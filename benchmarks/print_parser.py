@@ -0,0 +1,53 @@
+from argparse import ArgumentParser
+import re
+import time
+
+from benchmarks.workloads import generate_state_text, generate_vog_text
+from soar_print import iter_wmes
+from soar_state import SoarState
+from vog_parser import VOG
+
+
+# The two-pass regexes the parsers used before soar_print, kept as a baseline
+LEGACY_NODE_PATTERN = re.compile("\\((\\w\\d+)(([ \\n]+\\^([!-~]+)[ \\n]+([!-~ ]+))*)\\)")
+LEGACY_ATTRIBUTE_PATTERN = re.compile("\\^([\\w\\d\\-_]+)\\s+([\\w\\d\\-_*.]+|\\|.*\\|)")
+
+
+def legacy_iter_wmes(print_text):
+    for node_match in LEGACY_NODE_PATTERN.finditer(print_text):
+        for attr_match in LEGACY_ATTRIBUTE_PATTERN.finditer(node_match.group(0)):
+            yield node_match.group(1), attr_match.group(1), attr_match.group(2), False
+
+
+def time_call(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    cli = ArgumentParser(description="Throughput of the Soar print output parsers on synthetic text.")
+    cli.add_argument("-w", "--wmes", default=20000, type=int, help="Approximate number of WMEs in the state text.")
+    cli.add_argument("-n", "--vog-nodes", default=2000, type=int, help="Number of nodes in the VOG text.")
+    cli.add_argument("-r", "--repeats", default=5, type=int)
+    cli_namespace = cli.parse_args()
+
+    state_text = generate_state_text(cli_namespace.wmes)
+    vog_text = generate_vog_text(cli_namespace.vog_nodes)
+    num_state_wmes = sum(1 for _ in iter_wmes(state_text))
+    num_vog_wmes = sum(1 for _ in iter_wmes(vog_text))
+
+    cases = [
+        ("legacy regex (state)", lambda: list(legacy_iter_wmes(state_text)), num_state_wmes),
+        ("iter_wmes (state)", lambda: list(iter_wmes(state_text)), num_state_wmes),
+        ("SoarState.parse_state_text", lambda: SoarState().parse_state_text(state_text), num_state_wmes),
+        ("legacy regex (vog)", lambda: list(legacy_iter_wmes(vog_text)), num_vog_wmes),
+        ("iter_wmes (vog)", lambda: list(iter_wmes(vog_text)), num_vog_wmes),
+        ("VOG.parse_vog_text", lambda: VOG().parse_vog_text(vog_text), num_vog_wmes),
+    ]
+    for name, func, num_wmes in cases:
+        seconds = time_call(func, cli_namespace.repeats)
+        print(f"{name:>28}: {num_wmes / seconds:12.0f} WMEs/sec ({seconds * 1000:.2f} ms for {num_wmes} WMEs)")
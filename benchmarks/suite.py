@@ -0,0 +1,211 @@
+from argparse import ArgumentParser
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+from benchmarks.frame_transport import NullAgent
+from benchmarks.workloads import generate_frame, generate_matrix_dump, scale_state_text, scale_vog_text
+from frame_transport import FRAME_TRANSPORTS, make_frame_transport
+from matrix_cache import cache_path_for
+import matrix_viewer
+from soar_print import iter_wmes
+from soar_state import SoarState
+from vog_parser import VOG, Node
+
+
+@contextmanager
+def in_temp_dir():
+    """Runs the body in a scratch directory, since the VOG and matrix code read and write files in the cwd."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            yield Path(tmp_dir)
+        finally:
+            os.chdir(cwd)
+
+
+def time_call(func, repeats, setup=None):
+    """Returns the best and mean wall time of `repeats` calls of `func`, running `setup` untimed before each."""
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def bench(name, func, repeats, items=1, unit="calls", setup=None, **params):
+    best, mean = time_call(func, repeats, setup)
+    return {
+        "name": name,
+        "params": params,
+        "repeats": repeats,
+        "best_s": best,
+        "mean_s": mean,
+        "throughput": items / best,
+        "unit": f"{unit}/sec",
+    }
+
+
+def bench_state(state_copies, repeats):
+    state_text = scale_state_text(state_copies)
+    num_wmes = sum(1 for _ in iter_wmes(state_text))
+    parsed_state = SoarState()
+    parsed_state.parse_state_text(state_text)
+    return [
+        bench("SoarState.parse_state_text", lambda: SoarState().parse_state_text(state_text), repeats,
+              num_wmes, "WMEs", wmes=num_wmes),
+        bench("SoarState.parse_state_text (reused)", lambda: parsed_state.parse_state_text(state_text), repeats,
+              num_wmes, "WMEs", wmes=num_wmes),
+        bench("SoarState.iter", lambda: list(parsed_state.iter()), repeats,
+              num_wmes, "WMEs", wmes=num_wmes),
+        bench("SoarState.ids_with + parents_of", lambda: (parsed_state.ids_with("name", "create-vog"),
+                                                         parsed_state.parents_of("V5")), repeats,
+              wmes=num_wmes),
+    ]
+
+
+def bench_vog(vog_copies, repeats):
+    vog_text = scale_vog_text(vog_copies)
+    num_wmes = sum(1 for _ in iter_wmes(vog_text))
+    with in_temp_dir():
+        reparsed_vog = VOG()
+        reparsed_vog.parse_vog_text(vog_text)
+        return [
+            bench("VOG.parse_vog_text", lambda: VOG().parse_vog_text(vog_text), repeats,
+                  num_wmes, "WMEs", wmes=num_wmes),
+            bench("VOG.parse_vog_text (unchanged)", lambda: reparsed_vog.parse_vog_text(vog_text), repeats,
+                  num_wmes, "WMEs", wmes=num_wmes),
+        ]
+
+
+def bench_send_vision(frame_shape, repeats):
+    frames = [generate_frame(frame_shape, seed) for seed in range(4)]
+    results = []
+    for name in FRAME_TRANSPORTS:
+        kwargs = {"max_frame_shape": frame_shape} if name == "shm" else {}
+        transport = make_frame_transport(name, NullAgent(), **kwargs)
+        transport.attach()
+        try:
+            results.append(bench(f"send_vision encoding ({name})",
+                                 lambda: [transport.make_inject_command(frame) for frame in frames], repeats,
+                                 len(frames), "frames", shape=list(frame_shape)))
+        finally:
+            transport.close()
+    return results
+
+
+def bench_load_matrix(matrix_shape, repeats):
+    """Times `Node.load_matrix_data` plus the first matrix access, with and without a warm .npy cache."""
+    node = Node("N1")
+    node.node_id = 0
+    with in_temp_dir():
+        with open("node-0.json", "w") as dump_f:
+            json.dump(generate_matrix_dump(matrix_shape), dump_f)
+
+        def load():
+            node.load_matrix_data()
+            np.asarray(node.matrix).sum()
+
+        def remove_cache():
+            cache_path_for("node-0.json").unlink(missing_ok=True)
+
+        return [
+            bench("Node.load_matrix_data (cold)", load, repeats, setup=remove_cache, shape=list(matrix_shape)),
+            bench("Node.load_matrix_data (warm)", load, repeats, shape=list(matrix_shape)),
+        ]
+
+
+def bench_render(matrix_shape, repeats):
+    rng = np.random.default_rng(0)
+    heatmap = rng.standard_normal(matrix_shape[:2] + (1,)).astype(np.float32)
+    image = generate_frame(matrix_shape[:2] + (4,))
+    points = rng.standard_normal(matrix_shape[:2] + (3,)).astype(np.float32)
+
+    def render(show_func, matrix):
+        def call():
+            fig, _ = show_func(matrix)
+            fig.canvas.draw()
+            plt.close(fig)
+        return call
+
+    return [
+        bench("matrix_viewer.show_matrix_as_heatmap", render(matrix_viewer.show_matrix_as_heatmap, heatmap), repeats,
+              shape=list(heatmap.shape)),
+        bench("matrix_viewer.show_matrix_as_image", render(matrix_viewer.show_matrix_as_image, image), repeats,
+              shape=list(image.shape)),
+        bench("matrix_viewer.show_matrix_as_points", render(matrix_viewer.show_matrix_as_points, points), repeats,
+              shape=list(points.shape)),
+    ]
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def compare_results(old_results, new_results):
+    """Prints the throughput change of every benchmark present in both runs."""
+    old_by_key = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in old_results["results"]}
+    for result in new_results["results"]:
+        old = old_by_key.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is None:
+            continue
+        change = result["throughput"] / old["throughput"] - 1
+        print(f"{result['name']:>40}: {old['throughput']:12.1f} -> {result['throughput']:12.1f} {result['unit']} ({change:+.1%})")
+
+
+if __name__ == "__main__":
+    cli = ArgumentParser(description="Times the Python hot paths of the Soar <-> Malmo loop and writes the results as JSON.")
+    cli.add_argument("-o", "--output", default=None, type=Path, help="Write the results to this JSON file.")
+    cli.add_argument("-c", "--compare", default=None, type=Path, help="A previous results file to compare against.")
+    cli.add_argument("-r", "--repeats", default=5, type=int)
+    cli.add_argument("--state-copies", default=500, type=int, help="Copies of the sample state graph to hang off of S1.")
+    cli.add_argument("--vog-copies", default=20, type=int, help="Copies of the sample VOG.")
+    cli.add_argument("--rows", default=480, type=int, help="Rows of the generated frames and matrices.")
+    cli.add_argument("--cols", default=640, type=int, help="Columns of the generated frames and matrices.")
+    cli.add_argument("--render-rows", default=240, type=int, help="Rows of the matrices rendered with matrix_viewer.")
+    cli.add_argument("--render-cols", default=320, type=int, help="Columns of the matrices rendered with matrix_viewer.")
+    cli_namespace = cli.parse_args()
+
+    repeats = cli_namespace.repeats
+    results = []
+    results += bench_state(cli_namespace.state_copies, repeats)
+    results += bench_vog(cli_namespace.vog_copies, repeats)
+    results += bench_send_vision((cli_namespace.rows, cli_namespace.cols, 4), repeats)
+    results += bench_load_matrix((cli_namespace.rows, cli_namespace.cols, 3), repeats)
+    results += bench_render((cli_namespace.render_rows, cli_namespace.render_cols, 3), repeats)
+
+    for result in results:
+        print(f"{result['name']:>40}: {result['throughput']:12.1f} {result['unit']} (best {result['best_s'] * 1000:.2f} ms)")
+
+    run = {"meta": run_metadata(), "results": results}
+    if cli_namespace.output is not None:
+        with cli_namespace.output.open("w") as output_f:
+            json.dump(run, output_f, indent=2)
+    if cli_namespace.compare is not None:
+        with cli_namespace.compare.open("r") as compare_f:
+            print(f"\nCompared to {cli_namespace.compare}:")
+            compare_results(json.load(compare_f), run)
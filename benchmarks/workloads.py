@@ -0,0 +1,166 @@
+from itertools import groupby
+import random
+import re
+
+import numpy as np
+
+from soar_print import iter_wmes
+from soar_state import SAMPLE_STATE_TEXT
+from vog_parser import SAMPLE_VOG_TEXT
+
+
+IDENTIFIER_PATTERN = re.compile(r"^([A-Z])(\d+)$")
+VOG_NODE_ID_ATTRS = ["node-id", "a", "b", "source", "template"]
+
+VOG_OPS = [
+    ("create-float-filled-mat", ["fill-val", "size-x", "size-y"]),
+    ("create-x-coord-mat", ["size-x", "size-y"]),
+    ("create-y-coord-mat", ["size-x", "size-y"]),
+    ("add-mats", ["a", "b"]),
+    ("sub-mats", ["a", "b"]),
+    ("mul-mats", ["a", "b"]),
+    ("div-mats", ["a", "b"]),
+    ("apply-unary-op", ["unary-op"]),
+    ("extract-channel", ["channel"]),
+    ("stack-matrices", ["a", "b"]),
+]
+
+
+def format_print_node(soar_id, wmes, indent=0, width=80):
+    """Formats `(attr, value, is_acceptable)` triples the way Soar's `print` command lays out one identifier."""
+    lines = []
+    line = " " * indent + f"({soar_id}"
+    continuation = " " * (indent + len(soar_id) + 2)
+    for attr, val, is_acceptable in wmes:
+        wme_text = f"^{attr} {val}" + (" +" if is_acceptable else "")
+        if len(line) + len(wme_text) + 1 > width and line.strip() != f"({soar_id}":
+            lines.append(line)
+            line = continuation + wme_text
+        else:
+            line += " " + wme_text
+    lines.append(line + ")")
+    return "\n".join(lines)
+
+
+def generate_state_text(num_wmes=10000, fanout=4, seed=0):
+    """Generates `print S1 -d N` style text holding roughly `num_wmes` WMEs."""
+    rng = random.Random(seed)
+    next_id = {"count": 1}
+
+    def new_id(letter):
+        next_id["count"] += 1
+        return f"{letter}{next_id['count']}"
+
+    blocks = []
+    frontier = [("S1", 0)]
+    total = 0
+    while frontier and total < num_wmes:
+        soar_id, depth = frontier.pop(0)
+        wmes = []
+        for i in range(rng.randint(2, 2 + fanout)):
+            kind = rng.random()
+            if kind < 0.35:
+                child = new_id(rng.choice("CINOPRV"))
+                wmes.append((rng.choice(["node", "command", "link", "operator", "item"]), child, kind < 0.05))
+                frontier.append((child, depth + 1))
+            elif kind < 0.5:
+                wmes.append((f"name-{i}", f"|quoted ({rng.randint(0, 99)}) string {i}|", False))
+            elif kind < 0.75:
+                wmes.append((f"value-{i}", f"{rng.uniform(-1000, 1000):.6f}", False))
+            else:
+                wmes.append((f"attr-{i}", f"sym-{rng.randint(0, 999)}", False))
+        total += len(wmes)
+        blocks.append(format_print_node(soar_id, wmes, indent=2 * min(depth, 6)))
+    return "\n".join(blocks) + "\n"
+
+
+def generate_vog_text(num_nodes=500, seed=0):
+    """Generates `print V6 -d 4` style text for a random VOG with `num_nodes` operation nodes."""
+    rng = random.Random(seed)
+    node_ids = [f"N{i + 1}" for i in range(num_nodes)]
+    blocks = [format_print_node("V6", [("node", soar_id, False) for soar_id in reversed(node_ids)])]
+    for node_id in reversed(range(num_nodes)):
+        op_name, params = VOG_OPS[0] if node_id < 2 else rng.choice(VOG_OPS)
+        wmes = [("node-id", str(node_id)), ("node-name", f"|node {node_id} matrix|"), ("op-name", op_name)]
+        for param in params:
+            if param in ["a", "b"]:
+                wmes.append((param, str(rng.randrange(node_id))))
+            elif param == "fill-val":
+                wmes.append((param, f"{rng.uniform(0, 640):.6f}"))
+            elif param == "size-x":
+                wmes.append((param, "640"))
+            elif param == "size-y":
+                wmes.append((param, "480"))
+            elif param == "unary-op":
+                wmes.append((param, rng.choice(["sin", "cos", "negate"])))
+            elif param == "channel":
+                wmes.append((param, str(rng.randrange(4))))
+        wmes.append(("source", "-1" if params != ["unary-op"] and params != ["channel"] else str(rng.randrange(max(node_id, 1)))))
+        blocks.append(format_print_node(node_ids[node_id], [(a, v, False) for a, v in sorted(wmes)], indent=2))
+    return "\n".join(blocks) + "\n"
+
+
+def _print_blocks(print_text):
+    return [(soar_id, [wme[1:] for wme in wmes]) for soar_id, wmes in groupby(iter_wmes(print_text), key=lambda wme: wme[0])]
+
+
+def _shift_identifier(symbol, offset):
+    match = IDENTIFIER_PATTERN.match(symbol)
+    if match is None:
+        return symbol
+    return f"{match[1]}{int(match[2]) + offset}"
+
+
+def scale_state_text(copies=100, seed_text=SAMPLE_STATE_TEXT):
+    """Grows a real `print S1` sample by hanging renamed copies of its whole graph off of S1."""
+    blocks = _print_blocks(seed_text)
+    max_id = max(int(IDENTIFIER_PATTERN.match(soar_id)[2]) for soar_id, _ in blocks if IDENTIFIER_PATTERN.match(soar_id))
+    root_id, root_wmes = blocks[0]
+    root_wmes = list(root_wmes)
+    out_blocks = []
+    for copy in range(1, copies):
+        offset = copy * (max_id + 1)
+        root_wmes.append(("copy", _shift_identifier(root_id, offset), False))
+        for soar_id, wmes in blocks:
+            out_blocks.append((_shift_identifier(soar_id, offset),
+                               [(attr, _shift_identifier(val, offset), acc) for attr, val, acc in wmes]))
+    out_blocks = [(root_id, root_wmes)] + blocks[1:] + out_blocks
+    return "\n".join(format_print_node(soar_id, wmes, indent=2 if i else 0) for i, (soar_id, wmes) in enumerate(out_blocks)) + "\n"
+
+
+def scale_vog_text(copies=10, seed_text=SAMPLE_VOG_TEXT):
+    """Grows the sample `print V6` VOG into `copies` disjoint copies of the same operation graph."""
+    blocks = _print_blocks(seed_text)
+    vog_id, _ = blocks[0]
+    node_blocks = blocks[1:]
+    num_nodes = len(node_blocks)
+    vog_wmes = []
+    out_blocks = []
+    for copy in range(copies):
+        for soar_id, wmes in node_blocks:
+            new_id = _shift_identifier(soar_id, copy * num_nodes)
+            vog_wmes.append(("node", new_id, False))
+            new_wmes = []
+            for attr, val, acc in wmes:
+                if attr in VOG_NODE_ID_ATTRS and val != "-1":
+                    val = str(int(val) + copy * num_nodes)
+                new_wmes.append((attr, val, acc))
+            out_blocks.append((new_id, new_wmes))
+    return "\n".join([format_print_node(vog_id, vog_wmes)] + [format_print_node(i, w, indent=2) for i, w in out_blocks]) + "\n"
+
+
+def generate_frame(shape=(480, 640, 4), seed=0):
+    """Generates a random BGRA-D frame, with a smooth depth channel so it compresses like a real one."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, shape, dtype=np.uint8)
+    if shape[2] == 4:
+        rows, cols = shape[:2]
+        frame[:, :, 3] = (np.linspace(0, 255, rows)[:, np.newaxis] + rng.integers(0, 8, (rows, cols))).clip(0, 255)
+    return frame
+
+
+def generate_matrix_dump(shape=(480, 640, 3), seed=0):
+    """Generates the contents of an SVS `node-N.json` dump for a random float matrix."""
+    rows, cols, chans = shape
+    matrix = np.random.default_rng(seed).standard_normal(shape).astype(np.float32)
+    return {"Image Data": {"rows": rows, "cols": cols, "dt": f"{chans}f" if chans > 1 else "f", "data": matrix.ravel().tolist()}}
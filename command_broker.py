@@ -0,0 +1,74 @@
+import pysoarlib as psl
+
+from latency import NULL_LATENCY_TRACKER
+
+
+# Commands whose output only depends on the agent's current state, so they can be answered from the cache
+READ_ONLY_COMMANDS = {"p", "print", "matches", "ms", "pref", "preferences"}
+
+
+def is_read_only(command: str) -> bool:
+    words = command.split(maxsplit=1)
+    return bool(words) and words[0] in READ_ONLY_COMMANDS
+
+
+class CommandBroker(object):
+    """Routes commands to a `psl.SoarClient`, answering repeated read-only queries from a per-cycle cache.
+
+    Query results are cached by `(command, cycle)`. The connector starts a new cycle every input phase.
+    Any other command, run, step, source, excise and the like, clears the cache both before it
+    executes and after it returns, since it may run decision cycles or change productions.
+    Subscribers get the results of their queries pushed once per cycle by `publish`, instead of
+    each one issuing its own prints.
+    """
+    def __init__(self, agent: psl.SoarClient):
+        self.agent = agent
+        self.latency = NULL_LATENCY_TRACKER
+        self.cycle = 0
+        self.cache = {}
+        self.subscribers = []
+        self.hits = 0
+        self.misses = 0
+
+    def new_cycle(self):
+        self.cycle += 1
+        self.cache.clear()
+
+    def invalidate(self):
+        self.cache.clear()
+
+    def subscribe(self, commands, callback, spans=None):
+        """Calls `callback(*results)` with the results of `commands` on each `publish`.
+
+        `spans` optionally names the latency span each command is timed under.
+        """
+        self.subscribers.append((list(commands), callback, list(spans) if spans is not None else [None] * len(commands)))
+
+    def publish(self):
+        for commands, callback, spans in self.subscribers:
+            callback(*[self.query(command, span=span) for command, span in zip(commands, spans)])
+
+    def query(self, command: str, print_output=False, span=None) -> str:
+        """Returns the output of a read-only `command`, executing it at most once per cycle."""
+        key = (command, self.cycle)
+        result = self.cache.get(key)
+        if result is None:
+            self.misses += 1
+            with self.latency.span(span or "query"):
+                result = self.cache[key] = self.agent.execute_command(command, print_output)
+        else:
+            self.hits += 1
+            if print_output:
+                self.agent.print_handler(command)
+                self.agent.print_handler(result)
+        return result
+
+    def execute(self, command: str, print_output=False) -> str:
+        """Executes `command`, going through the cache if it is a read-only query."""
+        if is_read_only(command):
+            return self.query(command, print_output)
+        self.invalidate()
+        try:
+            return self.agent.execute_command(command, print_output)
+        finally:
+            self.invalidate()
@@ -0,0 +1,134 @@
+import json
+from pathlib import Path
+import time
+
+import numpy as np
+
+
+FRAME_EVENT = 0
+OBSERVATION_EVENT = 1
+ACTION_EVENT = 2
+EVENT_NAMES = {FRAME_EVENT: "frame", OBSERVATION_EVENT: "observation", ACTION_EVENT: "action"}
+
+# For frames `offset` is the frame number, otherwise it is the byte offset of the payload
+INDEX_DTYPE = np.dtype([("time", "<f8"), ("kind", "u1"), ("offset", "<i8"), ("length", "<i8")])
+DEFAULT_CHUNK_FRAMES = 256
+
+
+class EpisodeRecorder(object):
+    """Records frames, observation dicts and actions of one episode into a directory.
+
+    Frames go into fixed-stride `.npy` chunks of `chunk_frames` frames that are written through
+    memory maps. Observations (as JSON) and actions are appended to flat payload files, and a
+    small structured index records the time, kind and location of every event.
+    """
+    def __init__(self, path, chunk_frames=DEFAULT_CHUNK_FRAMES):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_frames = chunk_frames
+        self.frame_shape = None
+        self.frame_dtype = None
+        self.num_frames = 0
+        self._chunk = None
+        self._index = []
+        self._observations_file = (self.path / "observations.bin").open("wb")
+        self._actions_file = (self.path / "actions.bin").open("wb")
+
+    def _chunk_path(self, chunk_num):
+        return self.path / f"frames-{chunk_num:04d}.npy"
+
+    def record_frame(self, frame: np.ndarray, timestamp=None):
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+            self.frame_dtype = frame.dtype
+        elif frame.shape != self.frame_shape or frame.dtype != self.frame_dtype:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not match the episode's {self.frame_shape} {self.frame_dtype}")
+
+        slot = self.num_frames % self.chunk_frames
+        if slot == 0:
+            self._open_chunk(self.num_frames // self.chunk_frames)
+        self._chunk[slot] = frame
+        self._index.append((timestamp or time.time(), FRAME_EVENT, self.num_frames, 0))
+        self.num_frames += 1
+
+    def record_observation(self, observation: dict, timestamp=None):
+        self._append_payload(self._observations_file, OBSERVATION_EVENT, json.dumps(observation).encode(), timestamp)
+
+    def record_action(self, action_str: str, timestamp=None):
+        self._append_payload(self._actions_file, ACTION_EVENT, action_str.encode(), timestamp)
+
+    def _append_payload(self, payload_file, kind, payload, timestamp):
+        offset = payload_file.tell()
+        payload_file.write(payload)
+        self._index.append((timestamp or time.time(), kind, offset, len(payload)))
+
+    def _open_chunk(self, chunk_num):
+        if self._chunk is not None:
+            self._chunk.flush()
+            self.flush()
+        self._chunk = np.lib.format.open_memmap(self._chunk_path(chunk_num), mode="w+", dtype=self.frame_dtype,
+                                                shape=(self.chunk_frames,) + self.frame_shape)
+
+    def flush(self):
+        self._observations_file.flush()
+        self._actions_file.flush()
+        np.save(self.path / "index.npy", np.array(self._index, dtype=INDEX_DTYPE))
+        meta = {
+            "frame_shape": list(self.frame_shape) if self.frame_shape else None,
+            "frame_dtype": self.frame_dtype.str if self.frame_dtype else None,
+            "chunk_frames": self.chunk_frames,
+            "num_frames": self.num_frames,
+        }
+        with (self.path / "meta.json").open("w") as meta_f:
+            json.dump(meta, meta_f)
+
+    def close(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+            self._chunk = None
+        self.flush()
+        self._observations_file.close()
+        self._actions_file.close()
+
+
+class EpisodeLog(object):
+    """Reads an episode written by `EpisodeRecorder`, memory-mapping frame chunks as they are needed."""
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / "meta.json").open("r") as meta_f:
+            meta = json.load(meta_f)
+        self.chunk_frames = meta["chunk_frames"]
+        self.num_frames = meta["num_frames"]
+        self.index = np.load(self.path / "index.npy")
+        self._observations = np.memmap(self.path / "observations.bin", dtype=np.uint8, mode="r") \
+            if (self.path / "observations.bin").stat().st_size else np.empty(0, dtype=np.uint8)
+        self._actions = (self.path / "actions.bin").read_bytes()
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, frame_num) -> np.ndarray:
+        chunk_num, slot = divmod(frame_num, self.chunk_frames)
+        if chunk_num not in self._chunks:
+            self._chunks[chunk_num] = np.load(self.path / f"frames-{chunk_num:04d}.npy", mmap_mode="r")
+        return self._chunks[chunk_num][slot]
+
+    def observation(self, offset, length) -> dict:
+        return json.loads(self._observations[offset:offset + length].tobytes())
+
+    def action(self, offset, length) -> str:
+        return self._actions[offset:offset + length].decode()
+
+    def events(self):
+        """Yields `(time, kind, payload)` for every recorded event in order."""
+        for timestamp, kind, offset, length in self.index:
+            if kind == FRAME_EVENT:
+                yield timestamp, kind, self.frame(int(offset))
+            elif kind == OBSERVATION_EVENT:
+                yield timestamp, kind, self.observation(offset, length)
+            else:
+                yield timestamp, kind, self.action(offset, length)
+
+    def actions(self):
+        return [self.action(offset, length) for _, kind, offset, length in self.index if kind == ACTION_EVENT]
@@ -0,0 +1,109 @@
+import base64
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+DEFAULT_FRAME_SHAPE = (480, 640, 4)
+DEFAULT_NUM_SLOTS = 4
+
+
+class PNGFrameTransport(object):
+    """Encodes each frame as a base64 PNG and sends it inline with the inject command."""
+    name = "png"
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def attach(self):
+        pass
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def check_frame_layout(shape, dtype):
+        """Raises ValueError unless frames of `shape` and `dtype` can be PNG-encoded."""
+        if np.dtype(dtype) != np.uint8 or (len(shape) > 2 and shape[2] not in [1, 3, 4]):
+            raise ValueError(f"Cannot PNG-encode a {np.dtype(dtype)} frame with shape {tuple(shape)}")
+
+    def make_inject_command(self, visual: np.ndarray) -> str:
+        self.check_frame_layout(visual.shape, visual.dtype)
+        success, data = cv2.imencode('.png', visual)
+        if not success:
+            raise ValueError(f"Could not PNG-encode frame with shape {visual.shape}")
+        obs_data_b64 = base64.b64encode(data).decode()
+        return f"svs vsm.inject {obs_data_b64}"
+
+    def send(self, visual: np.ndarray):
+        self.agent.execute_command(self.make_inject_command(visual))
+
+
+class SharedMemoryFrameTransport(object):
+    """Writes raw frame bytes into a ring of fixed-size shared memory slots.
+
+    SVS is told the name and layout of the ring once by `attach`, after which each inject
+    command only carries the slot index and the frame shape.
+    """
+    name = "shm"
+
+    def __init__(self, agent, max_frame_shape=DEFAULT_FRAME_SHAPE, num_slots=DEFAULT_NUM_SLOTS, dtype=np.uint8):
+        self.agent = agent
+        self.dtype = np.dtype(dtype)
+        self.max_frame_shape = tuple(max_frame_shape)
+        self.num_slots = num_slots
+        self.slot_size = int(np.prod(self.max_frame_shape)) * self.dtype.itemsize
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_size * self.num_slots)
+        self.slots = np.ndarray((self.num_slots, self.slot_size), dtype=np.uint8, buffer=self.shm.buf)
+        self.next_slot = 0
+        self.attached = False
+
+    def attach(self):
+        self.agent.execute_command(f"svs vsm.attach-shm {self.shm.name} {self.num_slots} {self.slot_size} {self.dtype.name}")
+        self.attached = True
+
+    def close(self):
+        self.slots = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def check_frame_layout(self, shape, dtype):
+        """Raises ValueError unless frames of `shape` and `dtype` fit in a slot."""
+        if np.dtype(dtype) != self.dtype:
+            raise ValueError(f"Frame dtype {np.dtype(dtype)} does not match transport dtype {self.dtype}")
+        nbytes = int(np.prod(shape)) * self.dtype.itemsize
+        if nbytes > self.slot_size:
+            raise ValueError(f"Frame of {nbytes} bytes does not fit in a {self.slot_size} byte slot")
+
+    def write_frame(self, visual: np.ndarray) -> int:
+        self.check_frame_layout(visual.shape, visual.dtype)
+        slot = self.next_slot
+        self.next_slot = (self.next_slot + 1) % self.num_slots
+        slot_view = self.slots[slot, :visual.nbytes].view(self.dtype).reshape(visual.shape)
+        np.copyto(slot_view, visual, casting="no")
+        return slot
+
+    def make_inject_command(self, visual: np.ndarray) -> str:
+        slot = self.write_frame(visual)
+        rows, cols = visual.shape[:2]
+        chans = visual.shape[2] if visual.ndim > 2 else 1
+        return f"svs vsm.inject-shm {slot} {rows} {cols} {chans}"
+
+    def send(self, visual: np.ndarray):
+        if not self.attached:
+            self.attach()
+        self.agent.execute_command(self.make_inject_command(visual))
+
+
+FRAME_TRANSPORTS = {
+    PNGFrameTransport.name: PNGFrameTransport,
+    SharedMemoryFrameTransport.name: SharedMemoryFrameTransport,
+}
+
+
+def make_frame_transport(name, agent, **kwargs):
+    if name not in FRAME_TRANSPORTS:
+        raise ValueError(f"Unknown frame transport '{name}', expected one of {list(FRAME_TRANSPORTS)}")
+    return FRAME_TRANSPORTS[name](agent, **kwargs)
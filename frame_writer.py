@@ -0,0 +1,151 @@
+from collections import deque
+from datetime import datetime
+import os
+from pathlib import Path
+import threading
+import zipfile
+
+import cv2
+import numpy as np
+
+
+FRAMES_OFF = "off"
+FRAMES_KEEP_LATEST = "latest"
+FRAMES_STREAM = "stream"
+FRAME_WRITER_MODES = [FRAMES_OFF, FRAMES_KEEP_LATEST, FRAMES_STREAM]
+
+DEFAULT_LATEST_PATH = Path("observation_raw.png")
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_VIDEO_FPS = 20
+VIDEO_FOURCC = {".mp4": "mp4v", ".avi": "MJPG"}
+# Matches notebooks/frame_info.txt
+FRAME_INFO_TIME_FORMAT = "%Y%m%dT%H%M%S.%f"
+
+
+def frame_info_path_for(archive_path) -> Path:
+    archive_path = Path(archive_path)
+    return archive_path.with_name(f"{archive_path.stem}.frame_info.txt")
+
+
+class FrameWriter(threading.Thread):
+    """Persists observation frames on a background thread so the observation path never waits on disk.
+
+    `submit` copies the frame into one of a fixed pool of buffers and returns immediately. In
+    `FRAMES_KEEP_LATEST` mode only the newest pending frame is kept and written, atomically, to
+    `path` as an image. In `FRAMES_STREAM` mode every frame is appended to one archive at `path`,
+    a video for `.mp4`/`.avi` or `frame_NNNNNN` arrays in a `.npz`, and its time and pose are
+    logged to a `frame_info.txt`-style sidecar. Frames that arrive while the queue is full are
+    dropped and counted in `frames_dropped`.
+    """
+    def __init__(self, mode=FRAMES_KEEP_LATEST, path=None, queue_size=DEFAULT_QUEUE_SIZE, fps=DEFAULT_VIDEO_FPS):
+        super().__init__(daemon=True)
+        if mode not in FRAME_WRITER_MODES:
+            raise ValueError(f"Unknown frame writer mode '{mode}', expected one of {FRAME_WRITER_MODES}")
+        self.mode = mode
+        self.path = Path(path) if path is not None else DEFAULT_LATEST_PATH
+        if mode == FRAMES_STREAM and self.path.suffix not in [".npz"] + list(VIDEO_FOURCC):
+            raise ValueError(f"Cannot stream frames to '{self.path}', expected a .npz, .mp4 or .avi path")
+        self.queue_size = 1 if mode == FRAMES_KEEP_LATEST else queue_size
+        self.fps = fps
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._free_buffers = deque()
+        self._frame_shape = None
+        self._stopping = False
+
+        self._archive = None
+        self._frame_info = None
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+    def submit(self, frame: np.ndarray, pose=None, timestamp=None):
+        """Queues a copy of `frame` with its `(x, y, z, yaw, pitch)` pose. Never blocks on disk."""
+        if self.mode == FRAMES_OFF:
+            return
+        with self._condition:
+            self.frames_submitted += 1
+            if self._frame_shape != frame.shape:
+                self._frame_shape = frame.shape
+                self._free_buffers = deque(np.empty_like(frame) for _ in range(self.queue_size + 1))
+                self._queue.clear()
+
+            if self._free_buffers:
+                buffer = self._free_buffers.popleft()
+            elif self.mode == FRAMES_KEEP_LATEST and self._queue:
+                buffer = self._queue.popleft()[0]
+                self.frames_dropped += 1
+            else:
+                self.frames_dropped += 1
+                return
+            np.copyto(buffer, frame)
+            self._queue.append((buffer, pose, timestamp or datetime.now()))
+            self._condition.notify()
+
+    def stop(self):
+        """Writes out what is still queued, closes the archive and joins the thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._queue and not self._stopping:
+                        self._condition.wait()
+                    if not self._queue:
+                        break
+                    buffer, pose, timestamp = self._queue.popleft()
+                try:
+                    self._write(buffer, pose, timestamp)
+                    self.frames_written += 1
+                finally:
+                    with self._condition:
+                        if buffer.shape == self._frame_shape:
+                            self._free_buffers.append(buffer)
+        finally:
+            self._close()
+
+    def _write(self, frame, pose, timestamp):
+        if self.mode == FRAMES_KEEP_LATEST:
+            tmp_path = self.path.with_name(self.path.stem + ".tmp" + self.path.suffix)
+            cv2.imwrite(str(tmp_path), frame)
+            os.replace(tmp_path, self.path)
+            return
+
+        frame_num = self.frames_written + 1
+        if self._frame_info is None:
+            self._open_stream(frame)
+        if self.path.suffix == ".npz":
+            with self._archive.open(f"frame_{frame_num:06d}.npy", "w", force_zip64=True) as entry:
+                np.lib.format.write_array(entry, frame, allow_pickle=False)
+        else:
+            self._archive.write(np.ascontiguousarray(frame[:, :, :3]))
+        x, y, z, yaw, pitch = pose if pose is not None else (0.0, 0.0, 0.0, 0.0, 0.0)
+        self._frame_info.write(f"{timestamp.strftime(FRAME_INFO_TIME_FORMAT)} frame_{frame_num:06d} xyzyp: {x} {y} {z} {yaw} {pitch}\n")
+
+    def _open_stream(self, frame):
+        rows, cols = frame.shape[:2]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.suffix == ".npz":
+            self._archive = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*VIDEO_FOURCC[self.path.suffix])
+            self._archive = cv2.VideoWriter(str(self.path), fourcc, self.fps, (cols, rows))
+        self._frame_info = frame_info_path_for(self.path).open("w")
+        self._frame_info.write(f"width={cols}\nheight={rows}\n")
+
+    def _close(self):
+        if self._archive is not None:
+            if self.path.suffix == ".npz":
+                self._archive.close()
+            else:
+                self._archive.release()
+            self._archive = None
+        if self._frame_info is not None:
+            self._frame_info.close()
+            self._frame_info = None
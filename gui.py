@@ -1,6 +1,5 @@
 import json
 from pathlib import Path
-import re
 from subprocess import Popen
 import sys
 
@@ -11,31 +10,45 @@ from tkinter import filedialog as tkfd
 
 import MalmoPython
 import numpy as np
-import cv2
 
 import pysoarlib as psl
 
 from agent_connector import AgentConnector
+from frame_writer import FRAMES_OFF, FrameWriter
+from observation_pump import ObservationPump
+from output_console import DEFAULT_MAX_LINES, OutputConsole
+from production_index import ProductionIndex, changes_productions, parse_production_names
 from soar_state import SoarState
+from treeview_reconciler import TreeviewReconciler
 from vog_parser import VOG
+from wm_history import WMHistory
 
 
-OBSERVATION_SHAPE = (480, 640, 4)
-NODE_PATTERN = re.compile("\((\w\d+)(([ \n]+\^([!-~]+)[ \n]+([!-~ ]+))*)\)")
-ATTRIBUTE_PATTERN = re.compile("\^([\w\d\-_]+)\s+([\w\d\-_*.]+|\|.*\|)")
+VOG_THUMBNAIL_SIZE = (160, 120)
+LATENCY_REFRESH_MS = 1000
+# Printed every decision cycle to refresh the state and VOG viewers
+STATE_QUERY = "p s1 -d 6"
+VOG_QUERY = "p v6 -d 4"
+LATENCY_COLUMNS = ["count", "p50_ms", "p95_ms", "p99_ms"]
+# The production list stops at this many matches, Tk slows down with long listboxes
+MAX_LISTED_PRODUCTIONS = 500
 
 
 
 class MineSoarGUI(tk.Tk):
-    def __init__(self, agent: psl.SoarClient, connector: AgentConnector, port):
+    def __init__(self, agent: psl.SoarClient, connector: AgentConnector, port, console_max_lines=DEFAULT_MAX_LINES, echo_stdout=True,
+                 frame_writer: FrameWriter = None):
         super().__init__()
         self.title = "Minecraft Soar Testing Platform"
 
         self.agent = agent
         self.connector = connector
+        self.broker = connector.broker
 
         self.malmo_agent_host = MalmoPython.AgentHost()
+        self.observation_pump = None
         self.current_observation = None
+        self.frame_writer = frame_writer if frame_writer is not None else FrameWriter(FRAMES_OFF)
 
         self.mission_file = None
         self.mission_port = port
@@ -45,13 +58,18 @@ class MineSoarGUI(tk.Tk):
         self.mission_commands = None
         self.action_select_text_var = tk.StringVar(value=0)
 
-        self.production_list = []
+        self.production_index = ProductionIndex()
+        self.production_matches = []
         self.production_match_entry_text_var = tk.StringVar()
         self.production_match_select_list_var = tk.StringVar()
         self.source_file_text_var = tk.StringVar()
         self.soar_user_input_var = tk.StringVar()
         self.soar_state = SoarState()
-        self.vog = VOG()
+        self.viewed_state = self.soar_state
+        self.wm_history = WMHistory()
+        self.history_live = True
+        self.history_label_var = tk.StringVar(value="live")
+        self.vog = VOG(thumbnail_size=VOG_THUMBNAIL_SIZE)
 
         self.default_font = font.nametofont("TkFixedFont")
         self.bold_font = self.default_font.copy()
@@ -60,13 +78,23 @@ class MineSoarGUI(tk.Tk):
         self.italic_font.configure(slant="italic")
 
         self.soar_output_highlight_tag = "output-white"
+        self.console_max_lines = console_max_lines
+        self.echo_stdout = echo_stdout
 
         self.make_soar_control_widgets()
         self.make_mission_control_widgets()
         self.make_soar_output_widgets()
         self.make_vog_visual_widget()
+        if self.connector.latency.enabled:
+            self.make_latency_widgets()
 
         self._load_production_list()
+        self.broker.subscribe([STATE_QUERY, VOG_QUERY], self._soar_state_viewer_callback, spans=["print-state", "print-vog"])
+        self.protocol("WM_DELETE_WINDOW", self._close_callback)
+
+    def _close_callback(self):
+        self.vog.thumbnail_renderer.shutdown()
+        self.destroy()
 
 
     #############################
@@ -99,7 +127,7 @@ class MineSoarGUI(tk.Tk):
         self.print_all_matches_button   = ttk.Button(self.soar_control_frame, text="All Matches", command=self._print_all_matches_callback, width=11)
         self.print_prod_matches_button  = ttk.Button(self.soar_control_frame, text="Prod. Matches", command=self._print_prod_matches_callback, width=13)
         self.single_production_entry    = ttk.Entry(self.soar_control_frame, textvariable=self.production_match_entry_text_var, width=25)
-        self.single_production_list     = tk.Listbox(self.soar_control_frame, self.production_list, height=6, width=50)
+        self.single_production_list     = tk.Listbox(self.soar_control_frame, listvariable=self.production_match_select_list_var, height=6, width=50)
         
         self.reinit_soar_button = ttk.Button(self.soar_control_frame, text="Re-Init", command=self._reinit_soar_callback, width=7)
         self.excise_all_button  = ttk.Button(self.soar_control_frame, text="Excise All", command=self._excise_all_command_callback, width=10)
@@ -161,6 +189,7 @@ class MineSoarGUI(tk.Tk):
         #######################
         self.single_production_list.bind('<<ListboxSelect>>', self._production_select_callback)
         self.soar_input_entry.bind("<Return>", lambda e: self._soar_send_callback())
+        self.production_match_entry_text_var.trace_add("write", lambda *args: self._filter_production_list())
 
     def __output_highlight(func):
         def func_with_highlight(self, *args, **kwargs):
@@ -170,47 +199,56 @@ class MineSoarGUI(tk.Tk):
 
     @__output_highlight
     def _soar_send_callback(self):
-        self.agent.execute_command(self.soar_user_input_var.get(), True)
+        command = self.soar_user_input_var.get()
+        self.broker.execute(command, True)
+        if changes_productions(command):
+            self._load_production_list()
 
     @__output_highlight
     def _soar_step_callback(self, num_steps=1):
-        self.agent.execute_command(f"step {num_steps}", True)
+        self.broker.execute(f"step {num_steps}", True)
     
     @__output_highlight
-    def _print_state_callback(self, target="S1 -d 6"):
-        self.agent.execute_command(f"p {target}", True)
+    def _print_state_callback(self, target="s1 -d 6"):
+        self.broker.execute(f"p {target}", True)
 
     @__output_highlight
     def _soar_run_callback(self):
-        self.agent.execute_command("run", True)
+        self.broker.execute("run", True)
 
     @__output_highlight
     def _soar_phase_step_callback(self):
-        self.agent.execute_command("r -p 1", True)
+        self.broker.execute("r -p 1", True)
 
     @__output_highlight
     def _print_all_matches_callback(self):
-        self.agent.execute_command("matches", True)
+        self.broker.execute("matches", True)
 
     @__output_highlight
     def _print_prod_matches_callback(self):
-        target = self.production_match_entry_text_var.get()
-        self.agent.execute_command(f"matches {target}", True)
+        target = self.production_match_entry_text_var.get().strip()
+        # A partial name matches the first production listed for it
+        if target not in self.production_index.names and self.production_matches:
+            target = self.production_matches[0]
+        self.broker.execute(f"matches {target}", True)
 
     @__output_highlight
     def _production_select_callback(self, event):
         selection_index = self.single_production_list.curselection()
-        production = self.single_production_list.get(selection_index)
+        if not selection_index:
+            return
+        production = self.single_production_list.get(selection_index[0])
         self.production_match_entry_text_var.set(production)
 
     @__output_highlight
     def _reinit_soar_callback(self):
-        self.agent.execute_command("soar init", True)
+        self.broker.execute("soar init", True)
 
     @__output_highlight
     def _excise_all_command_callback(self):
-        self.agent.execute_command("production excise --all", True)
-        self._load_production_list()
+        self.broker.execute("production excise --all", True)
+        self.production_index.clear()
+        self._filter_production_list()
 
     @__output_highlight
     def _reset_soar_callback(self):
@@ -220,11 +258,19 @@ class MineSoarGUI(tk.Tk):
     @__output_highlight
     def _source_soar_file_callback(self):
         filename = self.source_file_text_var.get()
-        self.agent.execute_command(f"source {filename}", True)
+        self.broker.execute(f"source {filename}", True)
+        self._load_production_list()
 
     def _load_production_list(self):
-        raw_productions=self.agent.execute_command("p", False)
-        self.production_list = raw_productions.split("\n")
+        """Brings the production index up to date with the agent, re-indexing only the productions added or excised."""
+        raw_productions = self.broker.query("p")
+        added, removed = self.production_index.update(parse_production_names(raw_productions))
+        if added or removed:
+            self._filter_production_list()
+
+    def _filter_production_list(self):
+        self.production_matches = self.production_index.search(self.production_match_entry_text_var.get())
+        self.production_match_select_list_var.set(tuple(self.production_matches[:MAX_LISTED_PRODUCTIONS]))
 
 
     ##############################
@@ -297,6 +343,12 @@ class MineSoarGUI(tk.Tk):
         mission_record_spec = MalmoPython.MissionRecordSpec()
         self.malmo_agent_host.startMission(mission_spec, malmo_client_pool, mission_record_spec, 0, "TEST ALPHA")
 
+        if self.observation_pump is not None:
+            self.observation_pump.stop()
+        self.observation_pump = ObservationPump(self.malmo_agent_host)
+        self.observation_pump.start()
+        self.connector.observation_pump = self.observation_pump
+
     def _mission_do_action(self):
         action_str = self.action_select_text_var.get()
         self.perform_action(action_str=action_str)
@@ -321,6 +373,12 @@ class MineSoarGUI(tk.Tk):
         self.soar_state_viewer_tree = ttk.Treeview(self.soar_output_frame, columns=("value"))
         self.soar_vog_viewer_tree   = ttk.Treeview(self.soar_output_frame, columns=("value"))
 
+        self.history_frame          = ttk.Frame(self.soar_output_frame)
+        self.history_scale          = tk.Scale(self.history_frame, orient=tk.HORIZONTAL, showvalue=False, from_=0, to=0,
+                                               command=self._history_scrub_callback)
+        self.history_label          = ttk.Label(self.history_frame, textvariable=self.history_label_var, width=14, anchor=tk.CENTER)
+        self.history_live_button    = ttk.Button(self.history_frame, text="Live", command=self._history_live_callback)
+
         # GRID UI ELEMENTS
         ##################
         self.soar_output_frame.grid(column=1, row=0, rowspan=4, sticky=tk.NSEW)
@@ -332,47 +390,77 @@ class MineSoarGUI(tk.Tk):
         self.soar_state_viewer_tree.grid(column=2, row=1, stick=tk.NSEW)
         self.soar_vog_viewer_tree.grid(column=2, row=2, sticky=tk.NSEW)
 
+        self.history_frame.grid(column=2, row=3, sticky=tk.EW)
+        self.history_scale.grid(column=0, row=0, sticky=tk.EW)
+        self.history_label.grid(column=1, row=0, sticky=tk.NSEW)
+        self.history_live_button.grid(column=2, row=0, sticky=tk.NSEW)
+        self.history_frame.columnconfigure(0, weight=1)
+
         # CONFIGURE UI ELEMENTS
         #######################
         self.soar_output_text.configure(yscrollcommand=self.soar_output_scrollbar.set)
         self.soar_output_text.tag_configure("output-white", background='white smoke')
         self.soar_output_text.tag_configure("output-grey", background='alice blue')
+        self.soar_output_console = OutputConsole(self.soar_output_text, self.console_max_lines, echo_stdout=self.echo_stdout)
+        self.soar_output_console.start()
 
-        self.soar_state_viewer_tree.insert("", tk.END, "S1")
-        self.soar_vog_viewer_tree.insert("", tk.END, "-1")
+        self.soar_state_viewer_tree.insert("", tk.END, "S1", text="root", open=True)
+        self.soar_vog_viewer_tree.insert("", tk.END, "-1", text="root", open=True)
+        self.state_tree_reconciler = TreeviewReconciler(self.soar_state_viewer_tree, "S1")
+        self.vog_tree_reconciler = TreeviewReconciler(self.soar_vog_viewer_tree, "-1")
+        self.state_tree_reconciler.bind_expansion(self._write_state_to_viewer)
+        self.vog_tree_reconciler.bind_expansion(self._write_vog_text_to_viewer)
 
     def _soar_output_callback(self, text):
-        self.soar_output_text.insert(tk.END, text, (self.soar_output_highlight_tag,))
-        self.soar_output_text.insert(tk.END, "\n", (self.soar_output_highlight_tag,))
-        self.soar_output_text.yview_moveto(1.0)
-        print(text)
+        self.soar_output_console.write(text, self.soar_output_highlight_tag)
 
     def _soar_state_viewer_callback(self, state_text, vog_text):
-        self.soar_state.parse_state_text(state_text)
-        self._write_state_to_viewer()
-
-        self.vog.parse_vog_text(vog_text)
-        self._write_vog_text_to_viewer()
+        latency = self.connector.latency
+        with latency.span("parse-state"):
+            self.soar_state.parse_state_text(state_text)
+        with latency.span("record-history"):
+            self.wm_history.record(self.broker.cycle, self.soar_state.store)
+        self.history_scale.configure(from_=self.wm_history.start, to=self.wm_history.end - 1)
+        if self.history_live:
+            self.history_scale.set(self.wm_history.end - 1)
+            with latency.span("state-treeview"):
+                self._write_state_to_viewer()
+
+        with latency.span("parse-vog"):
+            vog_changes = self.vog.parse_vog_text(vog_text)
+        if vog_changes:
+            with latency.span("vog-treeview"):
+                self._write_vog_text_to_viewer()
 
     def _write_state_to_viewer(self):
-        self.soar_state_viewer_tree.delete("S1")
-        self.soar_state_viewer_tree.insert("", tk.END, "S1", text="root")
-        self.soar_state.insert_in_treeview(self.soar_state_viewer_tree)
-        self.soar_state_viewer_tree.item("S1", open=True)
+        self.state_tree_reconciler.reconcile(
+            (tree_id, parent_tree_id, attr, (val,))
+            for tree_id, parent_tree_id, attr, val in self.viewed_state.tree_rows(expanded=self.state_tree_reconciler.expanded)
+        )
+
+    def _history_scrub_callback(self, position):
+        record = int(float(position))
+        if record >= self.wm_history.end - 1:
+            self._history_live_callback()
+            return
+        record = max(record, self.wm_history.start)
+        self.history_live = False
+        self.viewed_state = SoarState(self.wm_history.store_at(record))
+        self.history_label_var.set(f"cycle {self.wm_history.cycle_of(record)}")
+        self._write_state_to_viewer()
+
+    def _history_live_callback(self):
+        already_live = self.history_live and self.viewed_state is self.soar_state
+        self.history_live = True
+        self.viewed_state = self.soar_state
+        self.history_label_var.set("live")
+        if len(self.wm_history) > 0:
+            self.history_scale.set(self.wm_history.end - 1)
+        if not already_live:
+            self._write_state_to_viewer()
 
     def _write_vog_text_to_viewer(self):
-        self.soar_vog_viewer_tree.delete("-1")
-        self.soar_vog_viewer_tree.insert("", tk.END, "-1", text="root")
-        for node_id, node in self.vog.nodes.items():
-            if node_id == -1: continue
-            if node.node_op != "save-to-file":
-                tree_id = self.soar_vog_viewer_tree.insert("-1", tk.END, str(node_id), text=node.node_name, values=(node.node_op,))
-            else:
-                tree_id = self.soar_vog_viewer_tree.insert(str(node.attributes["source"][0]), tk.END, str(node_id), text=node.node_name, values=(node.node_op,))
-            for attr, vals in node.attributes.items():
-                for v in vals:
-                    self.soar_vog_viewer_tree.insert(tree_id, tk.END, text=attr, values=(v,))
-        self.soar_vog_viewer_tree.item("-1", open=True)
+        self.vog_tree_reconciler.reconcile(self.vog.tree_rows(expanded=self.vog_tree_reconciler.expanded))
 
 
     ########################################
@@ -387,21 +475,49 @@ class MineSoarGUI(tk.Tk):
         self.draw_vog_button.grid(column=0, row=0, sticky=tk.NSEW)
 
 
+    #########################
+    # LATENCY PANEL WIDGETS #
+    #########################
+
+    def make_latency_widgets(self):
+        self.latency_frame = ttk.Frame(self, relief="groove", borderwidth=5)
+        self.latency_label = ttk.Label(self.latency_frame, text="Latency (ms)", anchor=tk.CENTER)
+        self.latency_tree = ttk.Treeview(self.latency_frame, columns=LATENCY_COLUMNS, height=8)
+        self.latency_dump_button = ttk.Button(self.latency_frame, text="Dump Latency", command=self._dump_latency_callback)
+
+        self.latency_frame.grid(column=0, row=2, sticky=tk.EW)
+        self.latency_label.grid(column=0, row=0, sticky=tk.NSEW, pady=5)
+        self.latency_tree.grid(column=0, row=1, sticky=tk.NSEW)
+        self.latency_dump_button.grid(column=0, row=2, sticky=tk.NSEW)
+
+        self.latency_tree.heading("#0", text="span")
+        self.latency_tree.column("#0", width=120)
+        for column in LATENCY_COLUMNS:
+            self.latency_tree.heading(column, text=column.removesuffix("_ms"))
+            self.latency_tree.column(column, width=60, anchor=tk.E)
+        self.after(LATENCY_REFRESH_MS, self._refresh_latency_panel)
+
+    def _refresh_latency_panel(self):
+        for span_name, stats in self.connector.latency.summary().items():
+            values = [stats["count"]] + [f"{stats[column]:.2f}" for column in LATENCY_COLUMNS[1:]]
+            if self.latency_tree.exists(span_name):
+                self.latency_tree.item(span_name, values=values)
+            else:
+                self.latency_tree.insert("", tk.END, span_name, text=span_name, values=values)
+        self.after(LATENCY_REFRESH_MS, self._refresh_latency_panel)
+
+    def _dump_latency_callback(self):
+        file_types = (('json files', '*.json'), ('csv files', '*.csv'))
+        filename = tkfd.asksaveasfilename(title="Dump latency", filetypes=file_types, defaultextension=".json")
+        if filename:
+            self.connector.latency.dump(filename)
+
+
     def perform_action(self, action_str):
-        true = True     # Allows the eval() method below to work
-        false = False   # Allows the eval() method below to work
-        action_idx = self.mission_commands.index(action_str)
-        obs, reward, done, info = self.env.step(action_idx)
-        print(info)
-        self.connector.update_info(eval(info))
-        self.update_observation(obs)
-        self._soar_step_callback(2)
-
-    def update_observation(self, observation:np.ndarray, info=None):
-        self.current_observation = np.flip(observation.reshape(OBSERVATION_SHAPE), axis=0)
-        observation_bgr = cv2.cvtColor(self.current_observation, cv2.COLOR_RGBA2BGRA)
-        cv2.imwrite("./observation_raw.png", observation_bgr)
-        self.connector.send_vision(observation_bgr)
-        state_text = self.agent.execute_command("p s1 -d 6", False)
-        vog_text = self.agent.execute_command("p v6 -d 4", False)
-        self._soar_state_viewer_callback(state_text, vog_text)
\ No newline at end of file
+        self.malmo_agent_host.sendCommand(action_str)
+
+    def update_observation(self, observation_bgr:np.ndarray):
+        # Frames arrive from the observation pump already flipped and converted to BGRA
+        self.current_observation = observation_bgr
+        self.frame_writer.submit(observation_bgr, self.connector.current_pose())
+        self.connector.send_vision(observation_bgr)
\ No newline at end of file
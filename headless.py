@@ -0,0 +1,238 @@
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import time
+
+import MalmoPython
+import pysoarlib as psl
+
+from agent_connector import AgentConnector
+from episode_log import EpisodeRecorder
+from latency import LatencyTracker
+from observation_pump import DROP_OLDEST, DROP_POLICIES, ObservationPump
+from vision_preprocessor import add_vision_arguments, vision_preprocessor_from_args
+
+
+class EpisodeStats(object):
+    def __init__(self, episode):
+        self.episode = episode
+        self.decisions = 0
+        self.frames = 0
+        self.actions = 0
+        self.start_time = time.perf_counter()
+        self.wall_time = 0.0
+        self.pump_counters = {}
+
+    def finish(self):
+        self.wall_time = time.perf_counter() - self.start_time
+
+    def as_dict(self):
+        return {
+            "episode": self.episode,
+            "decisions": self.decisions,
+            "frames": self.frames,
+            "actions": self.actions,
+            "wall_time": self.wall_time,
+            "decisions_per_sec": self.decisions / self.wall_time if self.wall_time else 0.0,
+            "frames_per_sec": self.frames / self.wall_time if self.wall_time else 0.0,
+            **self.pump_counters,
+        }
+
+
+class HeadlessRunner(object):
+    """Drives a Soar agent against a Malmo mission with no GUI, as fast as both sides allow."""
+    def __init__(self, agent: psl.SoarClient, connector: AgentConnector, port, steps_per_update=1,
+                 frame_queue_size=1, drop_policy=DROP_OLDEST, record_dir=None, mission_start_timeout=None):
+        self.agent = agent
+        self.connector = connector
+        self.connector.action_handler = self.perform_action
+        self.steps_per_update = steps_per_update
+        self.frame_queue_size = frame_queue_size
+        self.drop_policy = drop_policy
+        self.record_dir = record_dir
+        self.mission_start_timeout = mission_start_timeout
+
+        self.malmo_agent_host = MalmoPython.AgentHost()
+        self.malmo_client_pool = MalmoPython.ClientPool()
+        self.malmo_client_pool.add(MalmoPython.ClientInfo('127.0.0.1', port))
+        self.stats = None
+
+    def perform_action(self, action_str):
+        self.malmo_agent_host.sendCommand(action_str)
+        self.stats.actions += 1
+
+    def start_mission(self, mission_xml, experiment_id):
+        mission_spec = MalmoPython.MissionSpec(mission_xml, True)
+        mission_record_spec = MalmoPython.MissionRecordSpec()
+        self.malmo_agent_host.startMission(mission_spec, self.malmo_client_pool, mission_record_spec, 0, experiment_id)
+
+        start = time.perf_counter()
+        world_state = self.malmo_agent_host.getWorldState()
+        while not world_state.has_mission_begun:
+            if self.mission_start_timeout is not None and time.perf_counter() - start > self.mission_start_timeout:
+                raise RuntimeError(f"Mission '{experiment_id}' did not begin within {self.mission_start_timeout}s")
+            time.sleep(0.05)
+            world_state = self.malmo_agent_host.getWorldState()
+            for error in world_state.errors:
+                print(f"Mission error: {error.text}")
+        return world_state
+
+    def run_episode(self, mission_xml, episode, max_decisions=None):
+        self.agent.execute_command("soar init", False)
+        self.start_mission(mission_xml, f"HEADLESS {episode}")
+        self.stats = EpisodeStats(episode)
+        if self.record_dir is not None:
+            self.connector.recorder = EpisodeRecorder(Path(self.record_dir) / f"episode-{episode:04d}")
+
+        pump = ObservationPump(self.malmo_agent_host, queue_size=self.frame_queue_size, drop_policy=self.drop_policy)
+        self.connector.observation_pump = pump
+        pump.start()
+        while pump.is_mission_running:
+            with self.connector.latency.span("step"):
+                self.agent.execute_command(f"step {self.steps_per_update}", False)
+            self.stats.decisions += self.steps_per_update
+            if max_decisions is not None and self.stats.decisions >= max_decisions:
+                self.malmo_agent_host.sendCommand("quit")
+                max_decisions = None
+
+        pump.stop()
+        self.connector.observation_pump = None
+        if self.connector.recorder is not None:
+            self.connector.recorder.close()
+            self.connector.recorder = None
+        self.stats.finish()
+        self.stats.frames = pump.frames_taken
+        self.stats.pump_counters = pump.counters
+        return self.stats
+
+
+if __name__ == "__main__":
+    #######################
+    # PARSE CLI ARGUMENTS #
+    #######################
+    cli = ArgumentParser(description="Runs Soar agents in Malmo missions without the GUI and reports throughput.")
+    cli.add_argument("mission", type=Path, help="The mission XML file to run.")
+    cli.add_argument(
+        "-e", "--episodes",
+        default=1,
+        type=int,
+        help="How many episodes of the mission to run."
+    )
+    cli.add_argument(
+        "-p", "--port",
+        default=9000,
+        type=int,
+        help="The port to use for Python <-> Malmo communication."
+    )
+    cli.add_argument(
+        "-a", "--agent",
+        default="soar_agents/agent_gamma.soar",
+        type=Path,
+        help="The path to the .soar file which should be sourced for the agent."
+    )
+    cli.add_argument(
+        "-n", "--name",
+        default="Steve",
+        type=str,
+        help="The name for the agent in Minecraft."
+    )
+    cli.add_argument(
+        "-s", "--steps-per-update",
+        default=1,
+        type=int,
+        help="Decision cycles to run per step command, i.e. between checks for the end of the mission."
+    )
+    cli.add_argument(
+        "-m", "--max-decisions",
+        default=None,
+        type=int,
+        help="Quit each episode after this many decision cycles."
+    )
+    cli.add_argument(
+        "-q", "--frame-queue-size",
+        default=1,
+        type=int,
+        help="How many frames the observation pump may queue for Soar."
+    )
+    cli.add_argument(
+        "-d", "--drop-policy",
+        default=DROP_OLDEST,
+        type=str,
+        choices=DROP_POLICIES,
+        help="Which frame the observation pump drops when its queue is full."
+    )
+    cli.add_argument(
+        "-t", "--frame-transport",
+        default="png",
+        type=str,
+        choices=["png", "shm"],
+        help="How frames are handed to SVS: inline base64 PNG, or raw bytes in a shared memory ring."
+    )
+    cli.add_argument(
+        "-r", "--record",
+        default=None,
+        type=Path,
+        help="Record each episode's frames, observations and actions under this directory for replay.py."
+    )
+    cli.add_argument(
+        "-o", "--output",
+        default=None,
+        type=Path,
+        help="Write the per-episode results to this JSON file."
+    )
+    cli.add_argument(
+        "-L", "--latency-output",
+        default=None,
+        type=Path,
+        help="Time the connector callbacks and write p50/p95/p99 per span to this .json or .csv file."
+    )
+    add_vision_arguments(cli)
+    cli_namespace = cli.parse_args()
+
+    ######################
+    # CREATE SOAR CLIENT #
+    ######################
+    agent = psl.SoarClient(agent_name=cli_namespace.name,
+                            agent_source=str(cli_namespace.agent),
+                            write_to_stdout=False,
+                            watch_level=0)
+
+    minecraft_connector = AgentConnector(agent, frame_transport=cli_namespace.frame_transport,
+                                         vision_preprocessor=vision_preprocessor_from_args(cli_namespace))
+    minecraft_connector.add_output_command("take-action")
+    agent.add_connector("minecraft", minecraft_connector)
+    if cli_namespace.latency_output is not None:
+        minecraft_connector.latency = LatencyTracker()
+    runner = HeadlessRunner(agent, minecraft_connector, cli_namespace.port, cli_namespace.steps_per_update,
+                            cli_namespace.frame_queue_size, cli_namespace.drop_policy, cli_namespace.record)
+
+    #################
+    # PROGRAM START #
+    #################
+    agent.connect()
+    mission_xml = cli_namespace.mission.read_text()
+    results = []
+    for episode in range(cli_namespace.episodes):
+        stats = runner.run_episode(mission_xml, episode, cli_namespace.max_decisions).as_dict()
+        results.append(stats)
+        print(f"Episode {episode}: {stats['wall_time']:.2f}s, "
+              f"{stats['decisions_per_sec']:.1f} decisions/sec, {stats['frames_per_sec']:.1f} frames/sec, "
+              f"{stats['frames_dropped']} frames dropped")
+
+    total_time = sum(r["wall_time"] for r in results)
+    total_decisions = sum(r["decisions"] for r in results)
+    total_frames = sum(r["frames"] for r in results)
+    total_decisions_per_sec = total_decisions / total_time if total_time > 0 else 0.0
+    total_frames_per_sec = total_frames / total_time if total_time > 0 else 0.0
+    print(f"Total: {total_time:.2f}s, {total_decisions_per_sec:.1f} decisions/sec, "
+          f"{total_frames_per_sec:.1f} frames/sec")
+
+    if cli_namespace.output is not None:
+        with cli_namespace.output.open("w") as output_f:
+            json.dump(results, output_f, indent=2)
+
+    if cli_namespace.latency_output is not None:
+        minecraft_connector.latency.dump(cli_namespace.latency_output)
+
+    agent.kill()
+    minecraft_connector.frame_transport.close()
@@ -0,0 +1,247 @@
+import pysoarlib as psl
+
+
+class ScalarInput(object):
+    """Maps the observation value at `key` to one WME, converted with `value_type`.
+
+    With a `default` the WME is on the input-link from the first input phase, before any observation.
+    """
+    def __init__(self, key, value_type=float, default=None):
+        self.key = key
+        self.value_type = value_type
+        self.default = default
+
+    def make_writer(self, attr):
+        return ScalarWriter(attr, self)
+
+
+class StructInput(object):
+    """Maps the observation dict at `key` to an identifier WME with one child WME per field.
+
+    With `remove_when_absent` the identifier is removed from the input-link when an observation
+    lacks `key`, as Malmo does with LineOfSight when nothing is in range.
+    """
+    def __init__(self, key, fields, remove_when_absent=True):
+        self.key = key
+        self.fields = fields
+        self.remove_when_absent = remove_when_absent
+
+    def make_writer(self, attr):
+        return StructWriter(attr, self.fields)
+
+
+class ListInput(object):
+    """Maps the observation list at `key` to an identifier with one `^item_attr` identifier per item.
+
+    Items are matched between cycles by their `item_key` value (their position if it is None), so
+    an item that persists keeps its identifier and only its changed fields are written. With
+    `remove_when_absent` the identifier is removed when an observation lacks `key`.
+    """
+    def __init__(self, key, item_attr, item_key, fields, remove_when_absent=True):
+        self.key = key
+        self.item_attr = item_attr
+        self.item_key = item_key
+        self.fields = fields
+        self.remove_when_absent = remove_when_absent
+
+    def make_writer(self, attr):
+        return ListWriter(attr, self)
+
+
+# Input-link attribute -> where to find its value in the Malmo observation JSON
+INPUT_LINK_SCHEMA = {
+    "time-alive": ScalarInput("TimeAlive", int, 0),
+    "x-pos": ScalarInput("XPos", default=0.0),
+    "y-pos": ScalarInput("YPos", default=0.0),
+    "z-pos": ScalarInput("ZPos", default=0.0),
+    "pitch": ScalarInput("Pitch", default=0.0),
+    "yaw": ScalarInput("Yaw", default=0.0),
+    "world-time": ScalarInput("WorldTime", int, 0),
+    # Not from Malmo: the layout of the frames injected into SVS, see VisionPreprocessor.resolution
+    "vision": StructInput("Vision", {
+        "width": ScalarInput("width", int),
+        "height": ScalarInput("height", int),
+        "channels": ScalarInput("channels", int),
+        "depth-channel": ScalarInput("depth-channel", int),
+    }, remove_when_absent=False),
+    # From ObservationFromRay
+    "line-of-sight": StructInput("LineOfSight", {
+        "type": ScalarInput("type", str),
+        "hit-type": ScalarInput("hitType", str),
+        "in-range": ScalarInput("inRange", bool),
+        "distance": ScalarInput("distance"),
+        "x": ScalarInput("x"),
+        "y": ScalarInput("y"),
+        "z": ScalarInput("z"),
+    }),
+    # From ObservationFromNearbyEntities with <Range name="entities" .../>
+    "entities": ListInput("entities", "entity", "id", {
+        "name": ScalarInput("name", str),
+        "x": ScalarInput("x"),
+        "y": ScalarInput("y"),
+        "z": ScalarInput("z"),
+        "yaw": ScalarInput("yaw"),
+        "pitch": ScalarInput("pitch"),
+        "life": ScalarInput("life"),
+    }),
+}
+
+
+class ScalarWriter(object):
+    def __init__(self, attr, spec: ScalarInput):
+        self.attr = attr
+        self.spec = spec
+        self.value = None
+        self.wme = None
+        if spec.default is not None:
+            self.update(spec.default)
+
+    def update(self, value):
+        """Stores the converted `value`, returning whether it differs from the value last stored.
+
+        A None (JSON null) or unconvertible `value` is ignored and the stored value kept.
+        """
+        if value is None:
+            return False
+        if self.spec.value_type is bool:
+            value = "true" if value else "false"
+        else:
+            try:
+                value = self.spec.value_type(value)
+            except (TypeError, ValueError):
+                return False
+        if value == self.value:
+            return False
+        self.value = value
+        return True
+
+    def write(self, parent_id):
+        if self.wme is None:
+            self.wme = psl.SoarWME(self.attr, self.value)
+        else:
+            self.wme.set_value(self.value)
+        self.wme.update_wm(parent_id)
+
+    def remove(self):
+        if self.wme is not None:
+            self.wme.remove_from_wm()
+            self.wme = None
+
+
+class StructWriter(object):
+    """Writes a dict of fields under an identifier, touching only the fields that changed since the last write.
+
+    With `attr=None` the fields are written straight onto the parent, which is how the top-level
+    schema is applied to the input-link. A field whose spec sets `remove_when_absent` is swapped
+    for a fresh writer when an observation lacks it, and the old one's WMEs are removed on the
+    next write.
+    """
+    def __init__(self, attr, fields):
+        self.attr = attr
+        self.writers = [[field_attr, spec, spec.make_writer(field_attr)] for field_attr, spec in fields.items()]
+        self.dirty = [writer for _, _, writer in self.writers if isinstance(writer, ScalarWriter) and writer.value is not None]
+        self.present = set()
+        self.removed = []
+        self.id_wme = None
+
+    def update(self, observation):
+        changed = False
+        for entry in self.writers:
+            field_attr, spec, writer = entry
+            if spec.key in observation:
+                self.present.add(field_attr)
+                if writer.update(observation[spec.key]):
+                    if writer not in self.dirty:
+                        self.dirty.append(writer)
+                    changed = True
+            elif field_attr in self.present and getattr(spec, "remove_when_absent", False):
+                self.present.discard(field_attr)
+                if writer in self.dirty:
+                    self.dirty.remove(writer)
+                self.removed.append(writer)
+                entry[2] = spec.make_writer(field_attr)
+                changed = True
+        return changed
+
+    def write(self, parent_id):
+        if self.attr is None:
+            target_id = parent_id
+        else:
+            if self.id_wme is None:
+                self.id_wme = parent_id.CreateIdWME(self.attr)
+            target_id = self.id_wme
+        for writer in self.removed:
+            writer.remove()
+        for writer in self.dirty:
+            writer.write(target_id)
+        self.removed.clear()
+        self.dirty.clear()
+
+    def remove(self):
+        if self.id_wme is not None:
+            self.id_wme.DestroyWME()
+            self.id_wme = None
+        else:
+            for _, _, writer in self.writers:
+                writer.remove()
+
+
+class ListWriter(object):
+    def __init__(self, attr, spec: ListInput):
+        self.attr = attr
+        self.spec = spec
+        self.items = {}
+        self.added = []
+        self.removed = []
+        self.dirty = []
+        self.id_wme = None
+
+    def update(self, items):
+        item_key = self.spec.item_key
+        seen = set()
+        for i, item in enumerate(items):
+            key = item.get(item_key, i) if item_key is not None else i
+            seen.add(key)
+            writer = self.items.get(key)
+            if writer is None:
+                writer = self.items[key] = StructWriter(self.spec.item_attr, self.spec.fields)
+                writer.update(item)
+                self.added.append(writer)
+            elif writer.update(item) and writer not in self.dirty and writer not in self.added:
+                self.dirty.append(writer)
+        for key in [key for key in self.items if key not in seen]:
+            writer = self.items.pop(key)
+            if writer in self.added:
+                self.added.remove(writer)
+            else:
+                self.removed.append(writer)
+            if writer in self.dirty:
+                self.dirty.remove(writer)
+        return bool(self.added or self.removed or self.dirty)
+
+    def write(self, parent_id):
+        if self.id_wme is None:
+            self.id_wme = parent_id.CreateIdWME(self.attr)
+        for writer in self.removed:
+            writer.remove()
+        for writer in self.added + self.dirty:
+            writer.write(self.id_wme)
+        self.added.clear()
+        self.removed.clear()
+        self.dirty.clear()
+
+    def remove(self):
+        if self.id_wme is not None:
+            self.id_wme.DestroyWME()
+            self.id_wme = None
+        self.items.clear()
+
+
+class InputLinkWriter(StructWriter):
+    """Applies observations to the input-link according to a schema like `INPUT_LINK_SCHEMA`.
+
+    `update` can be called as often as observations arrive; `write`, called from the input phase,
+    only touches the WMEs whose values changed since the previous write.
+    """
+    def __init__(self, schema=INPUT_LINK_SCHEMA):
+        super().__init__(None, schema)
@@ -0,0 +1,149 @@
+import csv
+import json
+from pathlib import Path
+import time
+
+import numpy as np
+
+
+DEFAULT_WINDOW = 1024
+PERCENTILES = [50, 95, 99]
+DECISION_CYCLE_SPAN = "decision-cycle"
+
+
+class _Span(object):
+    __slots__ = ["histogram", "start"]
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.add(time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullSpan(object):
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class RollingHistogram(object):
+    """Keeps the last `window` durations (in nanoseconds) of one span in a ring buffer."""
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.samples = np.zeros(window, dtype=np.int64)
+        self.count = 0
+        self.total_ns = 0
+
+    def add(self, duration_ns):
+        self.samples[self.count % len(self.samples)] = duration_ns
+        self.count += 1
+        self.total_ns += duration_ns
+
+    def window(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def stats(self):
+        """Returns the count, mean and percentiles in milliseconds. Percentiles cover only the window."""
+        window = self.window()
+        stats = {
+            "count": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+        }
+        values = np.percentile(window, PERCENTILES) / 1e6 if len(window) else [0.0] * len(PERCENTILES)
+        for p, value in zip(PERCENTILES, values):
+            stats[f"p{p}_ms"] = float(value)
+        stats["max_ms"] = float(window.max()) / 1e6 if len(window) else 0.0
+        return stats
+
+
+class LatencyTracker(object):
+    """Times named spans on the monotonic `perf_counter` clock.
+
+    Use `with tracker.span("name"):` around the code to time. Span objects are created once per
+    name and reused, so a span must not be nested inside itself. `mark_cycle()` records the time
+    between consecutive calls as the `decision-cycle` span; the connector calls it every input phase.
+    """
+    enabled = True
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.histograms = {}
+        self._spans = {}
+        self._last_cycle_ns = None
+
+    def span(self, name):
+        span = self._spans.get(name)
+        if span is None:
+            span = self._spans[name] = _Span(self._histogram(name))
+        return span
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = RollingHistogram(self.window)
+        return histogram
+
+    def record(self, name, seconds):
+        self._histogram(name).add(int(seconds * 1e9))
+
+    def mark_cycle(self):
+        now = time.perf_counter_ns()
+        if self._last_cycle_ns is not None:
+            self._histogram(DECISION_CYCLE_SPAN).add(now - self._last_cycle_ns)
+        self._last_cycle_ns = now
+
+    def summary(self):
+        return {name: histogram.stats() for name, histogram in self.histograms.items()}
+
+    def dump(self, path):
+        """Writes the summary to `path`, as CSV if it ends in `.csv` and as JSON otherwise."""
+        path = Path(path)
+        summary = self.summary()
+        if path.suffix == ".csv":
+            with path.open("w", newline="") as csv_f:
+                writer = None
+                for name, stats in summary.items():
+                    if writer is None:
+                        writer = csv.DictWriter(csv_f, fieldnames=["span"] + list(stats))
+                        writer.writeheader()
+                    writer.writerow({"span": name, **stats})
+        else:
+            with path.open("w") as json_f:
+                json.dump(summary, json_f, indent=2)
+
+
+class NullLatencyTracker(object):
+    """A tracker that records nothing, so instrumented code costs one method call per span when timing is off."""
+    enabled = False
+    histograms = {}
+
+    def span(self, name):
+        return _NULL_SPAN
+
+    def record(self, name, seconds):
+        pass
+
+    def mark_cycle(self):
+        pass
+
+    def summary(self):
+        return {}
+
+    def dump(self, path):
+        pass
+
+
+NULL_LATENCY_TRACKER = NullLatencyTracker()
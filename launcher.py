@@ -0,0 +1,278 @@
+from argparse import ArgumentParser
+from itertools import product
+import json
+import multiprocessing as mp
+from pathlib import Path
+import queue
+import re
+import time
+import traceback
+
+from vision_preprocessor import add_vision_arguments
+
+
+STARTED_MESSAGE = "started"
+RESULT_MESSAGE = "result"
+MISSION_START_TIMEOUT = 120.0
+WORLD_GENERATOR_PATTERN = re.compile(r"<DefaultWorldGenerator(?![^>]*\bseed=)")
+
+
+def seed_mission_xml(mission_xml, seed):
+    """Sets the seed of a mission's DefaultWorldGenerator, unless it already has one. Flat worlds ignore it."""
+    return WORLD_GENERATOR_PATTERN.sub(f'<DefaultWorldGenerator seed="{seed}"', mission_xml, count=1)
+
+
+def make_jobs(missions, agents, episodes, base_seed=0):
+    """Returns `(job_index, mission, seed, agent)` for `episodes` seeds of every mission/agent pair."""
+    return [
+        (job_index, str(mission), base_seed + episode, str(agent))
+        for job_index, (mission, agent, episode) in enumerate(product(missions, agents, range(episodes)))
+    ]
+
+
+def worker_main(worker_id, port, job_queue, result_queue, options):
+    """Runs jobs from `job_queue` against the Minecraft client on `port` until it gets `None`.
+
+    Imports Malmo and Soar here so that the parent process never loads them. The Soar client is
+    rebuilt whenever a job uses a different agent source. If a job raises, its failure is reported
+    and the worker exits, since the Minecraft client behind it is likely in a bad state.
+    """
+    import pysoarlib as psl
+
+    from agent_connector import AgentConnector
+    from headless import HeadlessRunner
+    from vision_preprocessor import VisionPreprocessor
+
+    agent = None
+    connector = None
+    runner = None
+    agent_source = None
+    try:
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            job_index, mission, seed, job_agent_source = job
+            result_queue.put((STARTED_MESSAGE, worker_id, job_index))
+            result = {"job": job_index, "mission": mission, "seed": seed, "agent": job_agent_source,
+                      "worker": worker_id, "port": port}
+            try:
+                if job_agent_source != agent_source:
+                    if agent is not None:
+                        agent.kill()
+                        connector.frame_transport.close()
+                    agent = psl.SoarClient(agent_name=f"{options['name']}-{worker_id}",
+                                           agent_source=job_agent_source,
+                                           write_to_stdout=False,
+                                           watch_level=0)
+                    connector = AgentConnector(agent, frame_transport=options["frame_transport"],
+                                               vision_preprocessor=VisionPreprocessor(**options["vision"]))
+                    connector.add_output_command("take-action")
+                    agent.add_connector("minecraft", connector)
+                    runner = HeadlessRunner(agent, connector, port, options["steps_per_update"],
+                                            mission_start_timeout=options["mission_start_timeout"])
+                    agent.connect()
+                    agent_source = job_agent_source
+
+                agent.execute_command(f"srand {seed}", False)
+                mission_xml = seed_mission_xml(Path(mission).read_text(), seed)
+                stats = runner.run_episode(mission_xml, job_index, options["max_decisions"])
+                result.update(stats.as_dict())
+                result["status"] = "ok"
+                result_queue.put((RESULT_MESSAGE, worker_id, result))
+            except Exception:
+                result["status"] = "failed"
+                result["error"] = traceback.format_exc()
+                result_queue.put((RESULT_MESSAGE, worker_id, result))
+                break
+    finally:
+        if agent is not None:
+            agent.kill()
+            connector.frame_transport.close()
+
+
+def run_jobs(jobs, ports, options, result_callback=None):
+    """Runs `jobs` on one worker process per port and returns their results ordered by job index.
+
+    Jobs whose worker process died mid-episode, and jobs left over when every worker has died, are
+    reported with a `failed` or `not-run` status instead of stopping the launcher.
+    """
+    context = mp.get_context("spawn")
+    job_queue = context.Queue()
+    result_queue = context.Queue()
+    for job in jobs:
+        job_queue.put(job)
+    for _ in ports:
+        job_queue.put(None)
+
+    workers = {}
+    for worker_id, port in enumerate(ports):
+        worker = context.Process(target=worker_main, args=(worker_id, port, job_queue, result_queue, options),
+                                 name=f"malmo-worker-{worker_id}", daemon=True)
+        worker.start()
+        workers[worker_id] = worker
+
+    jobs_by_index = {job[0]: job for job in jobs}
+    running = {}
+    results = {}
+
+    def add_result(result):
+        results[result["job"]] = result
+        if result_callback is not None:
+            result_callback(result)
+
+    while len(results) < len(jobs):
+        try:
+            kind, worker_id, payload = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            for worker_id, worker in list(workers.items()):
+                if worker.is_alive():
+                    continue
+                # A worker that dies without reporting (e.g. a crash inside Malmo or Soar) fails its current job
+                job_index = running.pop(worker_id, None)
+                if job_index is not None and job_index not in results:
+                    _, mission, seed, agent = jobs_by_index[job_index]
+                    add_result({"job": job_index, "mission": mission, "seed": seed, "agent": agent,
+                                "worker": worker_id, "port": ports[worker_id], "status": "failed",
+                                "error": f"worker exited with code {worker.exitcode}"})
+                del workers[worker_id]
+            if not workers:
+                break
+            continue
+
+        if kind == STARTED_MESSAGE:
+            running[worker_id] = payload
+        else:
+            running.pop(worker_id, None)
+            add_result(payload)
+
+    for job_index, mission, seed, agent in jobs:
+        if job_index not in results:
+            add_result({"job": job_index, "mission": mission, "seed": seed, "agent": agent, "status": "not-run"})
+
+    job_queue.cancel_join_thread()
+    for worker in workers.values():
+        worker.join(timeout=5.0)
+        if worker.is_alive():
+            worker.terminate()
+    return [results[job_index] for job_index in sorted(results)]
+
+
+def summarize_results(results):
+    """Groups successful results by mission and agent, totalling decisions, frames and wall time."""
+    summary = {}
+    for result in results:
+        key = f"{result['mission']} {result['agent']}"
+        group = summary.setdefault(key, {"episodes": 0, "failed": 0, "decisions": 0, "frames": 0, "wall_time": 0.0})
+        if result["status"] != "ok":
+            group["failed"] += 1
+            continue
+        group["episodes"] += 1
+        group["decisions"] += result["decisions"]
+        group["frames"] += result["frames"]
+        group["wall_time"] += result["wall_time"]
+    for group in summary.values():
+        group["decisions_per_sec"] = group["decisions"] / group["wall_time"] if group["wall_time"] else 0.0
+    return summary
+
+
+if __name__ == "__main__":
+    #######################
+    # PARSE CLI ARGUMENTS #
+    #######################
+    cli = ArgumentParser(description="Runs episodes of Soar agents in Malmo missions on several Minecraft clients in parallel.")
+    cli.add_argument("missions", type=Path, nargs='+', help="The mission XML files to run.")
+    cli.add_argument(
+        "-a", "--agents",
+        default=[Path("soar_agents/agent_gamma.soar")],
+        type=Path,
+        nargs='+',
+        help="The .soar files to run each mission with."
+    )
+    cli.add_argument(
+        "-p", "--ports",
+        default=[9000],
+        type=int,
+        nargs='+',
+        help="The ports of the running Minecraft clients, one worker process is started per port."
+    )
+    cli.add_argument(
+        "-e", "--episodes",
+        default=1,
+        type=int,
+        help="How many episodes, each with its own seed, to run per mission and agent."
+    )
+    cli.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="The seed of the first episode, later episodes count up from it."
+    )
+    cli.add_argument(
+        "-n", "--name",
+        default="Steve",
+        type=str,
+        help="The name for the agents in Minecraft, suffixed with the worker number."
+    )
+    cli.add_argument(
+        "-s", "--steps-per-update",
+        default=1,
+        type=int,
+        help="Decision cycles to run per step command, i.e. between checks for the end of the mission."
+    )
+    cli.add_argument(
+        "-m", "--max-decisions",
+        default=None,
+        type=int,
+        help="Quit each episode after this many decision cycles."
+    )
+    cli.add_argument(
+        "-t", "--frame-transport",
+        default="png",
+        type=str,
+        choices=["png", "shm"],
+        help="How frames are handed to SVS: inline base64 PNG, or raw bytes in a shared memory ring."
+    )
+    cli.add_argument(
+        "-o", "--output",
+        default=None,
+        type=Path,
+        help="Write the per-episode results to this JSON file."
+    )
+    add_vision_arguments(cli)
+    cli_namespace = cli.parse_args()
+
+    options = {
+        "name": cli_namespace.name,
+        "steps_per_update": cli_namespace.steps_per_update,
+        "max_decisions": cli_namespace.max_decisions,
+        "frame_transport": cli_namespace.frame_transport,
+        "mission_start_timeout": MISSION_START_TIMEOUT,
+        "vision": {"scale": cli_namespace.vision_scale, "interpolation": cli_namespace.vision_interpolation,
+                   "roi": cli_namespace.vision_roi, "channels": cli_namespace.vision_channels, "dtype": cli_namespace.vision_dtype},
+    }
+    jobs = make_jobs(cli_namespace.missions, cli_namespace.agents, cli_namespace.episodes, cli_namespace.seed)
+
+    def print_result(result):
+        if result["status"] == "ok":
+            print(f"Job {result['job']} ({result['mission']}, seed {result['seed']}) on port {result['port']}: "
+                  f"{result['wall_time']:.2f}s, {result['decisions_per_sec']:.1f} decisions/sec")
+        else:
+            error_lines = result.get("error", "").strip().splitlines()
+            print(f"Job {result['job']} ({result['mission']}, seed {result['seed']}) {result['status']}"
+                  f"{': ' + error_lines[-1] if error_lines else ''}")
+
+    #################
+    # PROGRAM START #
+    #################
+    start = time.perf_counter()
+    results = run_jobs(jobs, cli_namespace.ports, options, print_result)
+    wall_time = time.perf_counter() - start
+
+    for key, group in summarize_results(results).items():
+        print(f"{key}: {group['episodes']} episodes, {group['failed']} failed, {group['decisions_per_sec']:.1f} decisions/sec")
+    print(f"Total: {len(jobs)} jobs on {len(cli_namespace.ports)} workers in {wall_time:.2f}s")
+
+    if cli_namespace.output is not None:
+        with cli_namespace.output.open("w") as output_f:
+            json.dump(results, output_f, indent=2)
@@ -6,7 +6,10 @@ import sys
 import pysoarlib as psl
 
 from agent_connector import AgentConnector
+from frame_writer import DEFAULT_LATEST_PATH, FRAME_WRITER_MODES, FRAMES_KEEP_LATEST, FrameWriter
 from gui import MineSoarGUI
+from latency import LatencyTracker
+from vision_preprocessor import add_vision_arguments, vision_preprocessor_from_args
 
 
 USER_NAME = "boggsj"
@@ -45,6 +48,45 @@ cli.add_argument(
     action="store_true",
     help="Flag that indicates the minecraft client should be launched along with the python app."
 )
+cli.add_argument(
+    "-t", "--frame-transport",
+    default="png",
+    type=str,
+    choices=["png", "shm"],
+    help="How frames are handed to SVS: inline base64 PNG, or raw bytes in a shared memory ring."
+)
+cli.add_argument(
+    "-c", "--console-lines",
+    default=5000,
+    type=int,
+    help="How many lines of Soar output the GUI console keeps before trimming the oldest."
+)
+cli.add_argument(
+    "--no-echo",
+    action="store_false",
+    dest="echo_stdout",
+    help="Do not echo Soar output to stdout as well as the GUI console."
+)
+cli.add_argument(
+    "-L", "--latency-output",
+    default=None,
+    type=Path,
+    help="Time the connector and GUI callbacks, show the timings in the GUI and write them to this .json or .csv file on exit."
+)
+cli.add_argument(
+    "-r", "--record-frames",
+    default=FRAMES_KEEP_LATEST,
+    type=str,
+    choices=FRAME_WRITER_MODES,
+    help="What to save of the observation frames, on a background thread: nothing, the latest frame as an image, or every frame to a video or .npz archive with a frame_info.txt pose log."
+)
+cli.add_argument(
+    "--frames-path",
+    default=None,
+    type=Path,
+    help=f"Where --record-frames writes to. Defaults to {DEFAULT_LATEST_PATH} for 'latest'; 'stream' needs a .mp4, .avi or .npz path."
+)
+add_vision_arguments(cli)
 cli_namespace = cli.parse_args()
 
 ######################
@@ -55,9 +97,12 @@ agent = psl.SoarClient(agent_name=cli_namespace.name,
                         write_to_stdout=True,
                         watch_level=cli_namespace.watch_level)
 
-minecraft_connector = AgentConnector(agent)
+minecraft_connector = AgentConnector(agent, frame_transport=cli_namespace.frame_transport,
+                                     vision_preprocessor=vision_preprocessor_from_args(cli_namespace))
 minecraft_connector.add_output_command("take-action")
 agent.add_connector("minecraft", minecraft_connector)
+if cli_namespace.latency_output is not None:
+    minecraft_connector.latency = LatencyTracker()
 
 # state_view_connector = StateViewerConnector(agent)
 # agent.add_connector("state_viewer", state_view_connector)
@@ -65,8 +110,13 @@ agent.add_connector("minecraft", minecraft_connector)
 ##############
 # CREATE GUI #
 ##############
-mine_gui = MineSoarGUI(agent, minecraft_connector, cli_namespace.port)
+frame_writer = FrameWriter(cli_namespace.record_frames, cli_namespace.frames_path)
+frame_writer.start()
+mine_gui = MineSoarGUI(agent, minecraft_connector, cli_namespace.port,
+                       console_max_lines=cli_namespace.console_lines, echo_stdout=cli_namespace.echo_stdout,
+                       frame_writer=frame_writer)
 minecraft_connector.gui = mine_gui
+minecraft_connector.action_handler = mine_gui.perform_action
 agent.print_handler = mine_gui._soar_output_callback
 
 #######################
@@ -80,4 +130,8 @@ if cli_namespace.launch_minecraft:
 # PROGRAM START #
 #################
 agent.connect()
-mine_gui.mainloop()
\ No newline at end of file
+mine_gui.mainloop()
+frame_writer.stop()
+minecraft_connector.frame_transport.close()
+if cli_namespace.latency_output is not None:
+    minecraft_connector.latency.dump(cli_namespace.latency_output)
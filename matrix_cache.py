@@ -0,0 +1,77 @@
+from argparse import ArgumentParser
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+# OpenCV FileStorage depth codes, as used in the "dt" field of SVS matrix dumps
+CV_DEPTH_DTYPES = {
+    "u": np.uint8,
+    "c": np.int8,
+    "w": np.uint16,
+    "s": np.int16,
+    "i": np.int32,
+    "f": np.float32,
+    "d": np.float64,
+    "h": np.float16,
+}
+
+
+def cache_path_for(json_path) -> Path:
+    return Path(json_path).with_suffix(".npy")
+
+
+def parse_data_type(data_type: str) -> tuple[int, np.dtype]:
+    if len(data_type) > 1:
+        chans = int(data_type[:-1])
+    else:
+        chans = 1
+    return chans, np.dtype(CV_DEPTH_DTYPES.get(data_type[-1], np.float64))
+
+
+def convert_matrix_json(json_path) -> Path:
+    """Parses an SVS `node-N.json` dump and stores its matrix as a `.npy` file next to it."""
+    json_path = Path(json_path)
+    with json_path.open("r") as node_file:
+        image_data = json.load(node_file)["Image Data"]
+    chans, dtype = parse_data_type(image_data["dt"])
+    shape = (image_data["rows"], image_data["cols"], chans)
+    matrix = np.asarray(image_data["data"], dtype=dtype).reshape(shape)
+
+    cache_path = cache_path_for(json_path)
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    with tmp_path.open("wb") as cache_file:
+        np.save(cache_file, matrix, allow_pickle=False)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def cache_is_stale(json_path) -> bool:
+    cache_path = cache_path_for(json_path)
+    if not cache_path.exists():
+        return True
+    return Path(json_path).stat().st_mtime > cache_path.stat().st_mtime
+
+
+def load_matrix(json_path) -> np.ndarray:
+    """Returns the matrix dumped to `json_path` as a read-only memory map of its `.npy` cache.
+
+    The JSON is only re-parsed when it is newer than the cache.
+    """
+    if cache_is_stale(json_path):
+        convert_matrix_json(json_path)
+    return np.load(cache_path_for(json_path), mmap_mode="r", allow_pickle=False)
+
+
+if __name__ == "__main__":
+    cli = ArgumentParser(description="Converts SVS node-N.json matrix dumps into memory-mappable .npy caches.")
+    cli.add_argument("files", type=Path, help="The JSON dumps to convert. Defaults to node*.json in the current directory.", nargs='*')
+    cli.add_argument("-f", "--force", action="store_true", help="Convert even if the cache is up to date.")
+    cli_namespace = cli.parse_args()
+
+    json_files = cli_namespace.files or sorted(Path.cwd().glob("node*.json"))
+    for json_file in json_files:
+        if cli_namespace.force or cache_is_stale(json_file):
+            print(f"Converting {json_file} -> {convert_matrix_json(json_file)}")
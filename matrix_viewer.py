@@ -8,12 +8,8 @@ from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 import matplotlib.pyplot as plt
 
-#######################
-# PARSE CLI ARGUMENTS #
-#######################
-cli = ArgumentParser(description="Python-based tool for viewing the .json files produced as debugging output from SVS.")
-cli.add_argument("names", type=str, help="The node names to be examined. Defaults to all.", nargs='*')
-cli_namespace = cli.parse_args()
+from matrix_cache import load_matrix
+from point_cloud import DECIMATION_METHODS, DEFAULT_MAX_POINTS, decimate, export_point_cloud, points_from_matrix
 
 
 def show_matrix_as_heatmap(matrix_data: np.ndarray) -> tuple[Figure, np.ndarray]:
@@ -42,7 +38,7 @@ def show_matrix_as_heatmap(matrix_data: np.ndarray) -> tuple[Figure, np.ndarray]
     return fig, ax
 
 def show_matrix_as_image(matrix_data):
-    assert type(matrix_data) is np.ndarray, "Image matrix must be of type np.ndarray"
+    assert isinstance(matrix_data, np.ndarray), "Image matrix must be of type np.ndarray"
 
     rows, cols, chans = matrix_data.shape
     assert chans in [1, 3, 4], "Image matrix must have either 1, 3, or 4 channels"
@@ -58,17 +54,19 @@ def show_matrix_as_image(matrix_data):
     
     return fig, np.array([ax,]).reshape(1,1)
 
-def show_matrix_as_points(matrix_data):
-    assert type(matrix_data) is np.ndarray, "Image matrix must be of type np.ndarray"
+def show_matrix_as_points(matrix_data, max_points=DEFAULT_MAX_POINTS, decimation="voxel"):
+    assert isinstance(matrix_data, np.ndarray), "Image matrix must be of type np.ndarray"
 
     rows, cols, chans = matrix_data.shape
     assert chans in [2, 3], "Image matrix must have either 2 or 3 channels"
 
     if chans == 3:
-        dist_matrix = np.sqrt(np.square(matrix_data[:,:,2]) + np.square(matrix_data[:,:,0]) + np.square(matrix_data[:,:,1]))
+        # Plotting every pixel of a full frame is far too slow for matplotlib, so only a decimated cloud is drawn
+        points = decimate(points_from_matrix(matrix_data), max_points, decimation)
+        dist = np.linalg.norm(points, axis=1)
         fig = plt.figure()
         ax = plt.axes(projection="3d")
-        ax.scatter3D(matrix_data[:,:,2].flatten(), matrix_data[:,:,0].flatten(), matrix_data[:,:,1].flatten(), c=dist_matrix)
+        ax.scatter3D(points[:,2], points[:,0], points[:,1], c=dist)
         ax.view_init(15, -135)
     
     return fig, ax
@@ -76,6 +74,18 @@ def show_matrix_as_points(matrix_data):
 
 
 if __name__ == "__main__":
+    #######################
+    # PARSE CLI ARGUMENTS #
+    #######################
+    cli = ArgumentParser(description="Python-based tool for viewing the .json files produced as debugging output from SVS.")
+    cli.add_argument("names", type=str, help="The node names to be examined. Defaults to all.", nargs='*')
+    cli.add_argument("-m", "--max-points", default=DEFAULT_MAX_POINTS, type=int, help="The most points to plot for xyz matrices.")
+    cli.add_argument("-d", "--decimation", default="voxel", choices=DECIMATION_METHODS, help="How xyz matrices are thinned out for plotting.")
+    cli.add_argument("-e", "--export-points", default=None, type=Path,
+                     help="Write the full point cloud of xyz matrices to this directory (as .ply, or .npz with --npz) instead of plotting them.")
+    cli.add_argument("--npz", action="store_true", help="Export point clouds as .npz instead of .ply.")
+    cli_namespace = cli.parse_args()
+
     key_file = Path("./key.json")
     with key_file.open('r') as f:
         node_key = json.load(f)
@@ -90,25 +100,19 @@ if __name__ == "__main__":
         
         node_op = node_key[node_id]["op-name"][0]
 
-        with json_file.open('r') as f:
-            raw_json = json.load(f)
-            image_data = raw_json['Image Data']
-            rows = image_data['rows']
-            cols = image_data['cols']
-            raw_data = image_data['data']
-            data_type = image_data['dt']
-            if len(data_type) > 1:
-                channels = int(data_type[0])
-            else:
-                channels = 1
-        
-        matrix = np.array(raw_data).reshape((rows,cols,channels))
+        matrix = load_matrix(json_file)
+        rows, cols, channels = matrix.shape
 
         print(f"Processing node-{node_id} ({node_op}) with shape ({rows}, {cols}, {channels})...")
         if node_op in ["save-to-file", "get-from-vsm"]:
             fig, axes = show_matrix_as_image(matrix)
+        elif node_op in ["stack-matrices"] and cli_namespace.export_points is not None:
+            cli_namespace.export_points.mkdir(parents=True, exist_ok=True)
+            suffix = ".npz" if cli_namespace.npz else ".ply"
+            out_path = export_point_cloud(cli_namespace.export_points / f"node-{node_id}{suffix}", points_from_matrix(matrix))
+            print(f"Wrote {out_path}")
         elif node_op in ["stack-matrices"]:
-            fig, axes = show_matrix_as_points(matrix)
+            fig, axes = show_matrix_as_points(matrix, cli_namespace.max_points, cli_namespace.decimation)
         else:
             fig, axes = show_matrix_as_heatmap(matrix)
             axes = axes.flatten()
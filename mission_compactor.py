@@ -0,0 +1,216 @@
+from argparse import ArgumentParser
+from collections import defaultdict
+from pathlib import Path
+import time
+import xml.etree.ElementTree as ET
+
+
+MALMO_NS = "http://ProjectMalmo.microsoft.com"
+XSI_NS = "http://www.w3.org/2001/XMLSchema-instance"
+DRAW_BLOCK_TAG = f"{{{MALMO_NS}}}DrawBlock"
+DRAW_CUBOID_TAG = f"{{{MALMO_NS}}}DrawCuboid"
+DRAWING_DECORATOR_TAG = f"{{{MALMO_NS}}}DrawingDecorator"
+# Everything about a block other than its position; blocks only merge if all of these match
+BLOCK_STYLE_ATTRS = ["type", "colour", "variant", "face"]
+
+ET.register_namespace("", MALMO_NS)
+ET.register_namespace("xsi", XSI_NS)
+
+
+def greedy_boxes(cells):
+    """Covers a set of `(x, y, z)` cells exactly with boxes, growing each box along x, then z, then y.
+
+    Returns `(x1, y1, z1, x2, y2, z2)` tuples with inclusive corners, as DrawCuboid uses them.
+    """
+    remaining = set(cells)
+    boxes = []
+    for x1, y1, z1 in sorted(cells, key=lambda c: (c[1], c[2], c[0])):
+        if (x1, y1, z1) not in remaining:
+            continue
+        x2 = x1
+        while (x2 + 1, y1, z1) in remaining:
+            x2 += 1
+        z2 = z1
+        while all((x, y1, z2 + 1) in remaining for x in range(x1, x2 + 1)):
+            z2 += 1
+        y2 = y1
+        while all((x, y2 + 1, z) in remaining for x in range(x1, x2 + 1) for z in range(z1, z2 + 1)):
+            y2 += 1
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                for z in range(z1, z2 + 1):
+                    remaining.discard((x, y, z))
+        boxes.append((x1, y1, z1, x2, y2, z2))
+    return boxes
+
+
+def _box_element(style, box):
+    x1, y1, z1, x2, y2, z2 = box
+    if (x1, y1, z1) == (x2, y2, z2):
+        element = ET.Element(DRAW_BLOCK_TAG, dict(style))
+        for attr, value in zip("xyz", [x1, y1, z1]):
+            element.set(attr, str(value))
+    else:
+        element = ET.Element(DRAW_CUBOID_TAG, dict(style))
+        for attr, value in zip(["x1", "y1", "z1", "x2", "y2", "z2"], box):
+            element.set(attr, str(value))
+    return element
+
+
+def _merge_run(run):
+    """Returns the fewest DrawBlock/DrawCuboid elements that draw the same blocks as a run of DrawBlocks.
+
+    Two layouts are tried: disjoint boxes per block style, and, when the run fills its whole
+    bounding box, that box drawn in the most common style with the other styles drawn over it.
+    The second is what turns a checkerboard into one cuboid plus half its squares.
+    """
+    # Later blocks overwrite earlier ones at the same position, so only the last one counts
+    final_blocks = {}
+    for element in run:
+        position = tuple(int(element.get(axis)) for axis in "xyz")
+        final_blocks.pop(position, None)
+        final_blocks[position] = tuple((attr, element.get(attr)) for attr in BLOCK_STYLE_ATTRS if element.get(attr) is not None)
+
+    cells_by_style = defaultdict(list)
+    for position, style in final_blocks.items():
+        cells_by_style[style].append(position)
+    boxes_by_style = {style: greedy_boxes(cells) for style, cells in cells_by_style.items()}
+    merged = [_box_element(style, box) for style, boxes in boxes_by_style.items() for box in boxes]
+
+    lows = [min(axis) for axis in zip(*final_blocks)]
+    highs = [max(axis) for axis in zip(*final_blocks)]
+    volume = (highs[0] - lows[0] + 1) * (highs[1] - lows[1] + 1) * (highs[2] - lows[2] + 1)
+    if volume == len(final_blocks) and len(cells_by_style) > 1:
+        base_style = max(cells_by_style, key=lambda style: len(cells_by_style[style]))
+        overdrawn = [_box_element(base_style, tuple(lows) + tuple(highs))]
+        overdrawn += [_box_element(style, box) for style, boxes in boxes_by_style.items() if style != base_style for box in boxes]
+        if len(overdrawn) < len(merged):
+            return overdrawn
+    return merged
+
+
+def compact_drawing_decorator(decorator):
+    """Merges every run of consecutive DrawBlock elements in `decorator` in place.
+
+    Comments may sit inside a run, any other drawing element ends it, so the order in which
+    overlapping cuboids, blocks and entities are drawn is unchanged.
+    """
+    children = list(decorator)
+    runs = [[]]
+    for child in children:
+        if child.tag == DRAW_BLOCK_TAG:
+            runs[-1].append(child)
+        elif child.tag is not ET.Comment and runs[-1]:
+            runs.append([])
+
+    for run in runs:
+        if len(run) < 2:
+            continue
+        insert_at = list(decorator).index(run[0])
+        for element in run:
+            decorator.remove(element)
+        for offset, element in enumerate(_merge_run(run)):
+            decorator.insert(insert_at + offset, element)
+
+
+def count_drawing(root):
+    """Counts the drawing elements of a mission and the block placements they make, overdrawn blocks included."""
+    counts = {"elements": 0, "draw_blocks": 0, "draw_cuboids": 0, "blocks": 0}
+    for decorator in root.iter(DRAWING_DECORATOR_TAG):
+        for child in decorator:
+            if child.tag is ET.Comment:
+                continue
+            counts["elements"] += 1
+            if child.tag == DRAW_BLOCK_TAG:
+                counts["draw_blocks"] += 1
+                counts["blocks"] += 1
+            elif child.tag == DRAW_CUBOID_TAG:
+                counts["draw_cuboids"] += 1
+                x1, y1, z1, x2, y2, z2 = _cuboid_corners(child)
+                counts["blocks"] += (x2 - x1 + 1) * (y2 - y1 + 1) * (z2 - z1 + 1)
+    return counts
+
+
+def _cuboid_corners(element):
+    corners = [int(element.get(attr)) for attr in ["x1", "y1", "z1", "x2", "y2", "z2"]]
+    return tuple(min(a, b) for a, b in zip(corners[:3], corners[3:])) + tuple(max(a, b) for a, b in zip(corners[:3], corners[3:]))
+
+
+def drawn_world(root):
+    """Replays the DrawBlock and DrawCuboid elements in order, returning the final style of every drawn position."""
+    world = {}
+    for decorator in root.iter(DRAWING_DECORATOR_TAG):
+        for child in decorator:
+            if child.tag not in [DRAW_BLOCK_TAG, DRAW_CUBOID_TAG]:
+                continue
+            style = tuple((attr, child.get(attr)) for attr in BLOCK_STYLE_ATTRS if child.get(attr) is not None)
+            if child.tag == DRAW_BLOCK_TAG:
+                world[tuple(int(child.get(axis)) for axis in "xyz")] = style
+                continue
+            x1, y1, z1, x2, y2, z2 = _cuboid_corners(child)
+            for x in range(x1, x2 + 1):
+                for y in range(y1, y2 + 1):
+                    for z in range(z1, z2 + 1):
+                        world[(x, y, z)] = style
+    return world
+
+
+def parse_mission(mission_xml):
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+    return ET.fromstring(mission_xml, parser=parser)
+
+
+def compact_mission_xml(mission_xml):
+    """Returns the compacted mission XML. Comments are kept, but the document is re-indented."""
+    root = parse_mission(mission_xml)
+    for decorator in root.iter(DRAWING_DECORATOR_TAG):
+        compact_drawing_decorator(decorator)
+    ET.indent(root, space="  ")
+    return '<?xml version="1.0"?>\n' + ET.tostring(root, encoding="unicode") + "\n"
+
+
+def time_mission_load(mission_xml, repeats=5):
+    """Returns the best time to parse the XML with ElementTree and, if Malmo is installed, to build a validated MissionSpec."""
+    parse_time = min(_time_call(lambda: parse_mission(mission_xml)) for _ in range(repeats))
+    try:
+        import MalmoPython
+    except ImportError:
+        return {"parse_s": parse_time, "validate_s": None}
+    validate_time = min(_time_call(lambda: MalmoPython.MissionSpec(mission_xml, True)) for _ in range(repeats))
+    return {"parse_s": parse_time, "validate_s": validate_time}
+
+
+def _time_call(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _format_seconds(seconds):
+    return "n/a (MalmoPython not installed)" if seconds is None else f"{seconds * 1000:.2f} ms"
+
+
+if __name__ == "__main__":
+    cli = ArgumentParser(description="Merges runs of DrawBlock elements in Malmo missions into DrawCuboid elements.")
+    cli.add_argument("missions", type=Path, nargs='+', help="The mission XML files to compact.")
+    cli.add_argument("-i", "--in-place", action="store_true", help="Overwrite the missions instead of writing <name>.compact.xml next to them.")
+    cli_namespace = cli.parse_args()
+
+    for mission_path in cli_namespace.missions:
+        mission_xml = mission_path.read_text()
+        compact_xml = compact_mission_xml(mission_xml)
+        out_path = mission_path if cli_namespace.in_place else mission_path.with_suffix(".compact.xml")
+        out_path.write_text(compact_xml)
+
+        before_root = parse_mission(mission_xml)
+        after_root = parse_mission(compact_xml)
+        before = {**count_drawing(before_root), **time_mission_load(mission_xml)}
+        after = {**count_drawing(after_root), **time_mission_load(compact_xml)}
+        print(f"{mission_path} -> {out_path}")
+        print(f"  equivalent world: {'yes' if drawn_world(before_root) == drawn_world(after_root) else 'NO'}")
+        print(f"  blocks placed: {before['blocks']} -> {after['blocks']}")
+        print(f"  drawing elements: {before['elements']} -> {after['elements']} "
+              f"(DrawBlock {before['draw_blocks']} -> {after['draw_blocks']}, "
+              f"DrawCuboid {before['draw_cuboids']} -> {after['draw_cuboids']})")
+        print(f"  parse: {_format_seconds(before['parse_s'])} -> {_format_seconds(after['parse_s'])}")
+        print(f"  validate: {_format_seconds(before['validate_s'])} -> {_format_seconds(after['validate_s'])}")
@@ -0,0 +1,158 @@
+from collections import deque
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import MalmoPython
+
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+DROP_POLICIES = [DROP_OLDEST, DROP_NEWEST]
+DEFAULT_MISSION_START_TIMEOUT = 120.0
+
+
+class ObservationPump(threading.Thread):
+    """Continuously drains `AgentHost.getWorldState()` on a background thread.
+
+    Frames are decoded into a pool of preallocated buffers and queued, observations are parsed as
+    JSON and only the newest is kept. With the default `queue_size` of 1 and the `DROP_OLDEST`
+    policy the consumer always sees the latest frame; larger queues and `DROP_NEWEST` can be used
+    to size the pipeline under load, with the `*_dropped` counters showing what was lost.
+
+    The pump may be started right after `startMission`: it only stops on the mission ending once
+    the mission has begun, and gives up if it has not begun within `mission_start_timeout` seconds.
+    """
+    def __init__(self, agent_host, queue_size=1, drop_policy=DROP_OLDEST, convert_bgra=True, poll_interval=0.001,
+                 mission_start_timeout=DEFAULT_MISSION_START_TIMEOUT):
+        super().__init__(daemon=True)
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {DROP_POLICIES}")
+        self.agent_host = agent_host
+        self.agent_host.setVideoPolicy(MalmoPython.VideoPolicy.LATEST_FRAME_ONLY)
+        self.agent_host.setObservationsPolicy(MalmoPython.ObservationsPolicy.LATEST_OBSERVATION_ONLY)
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.convert_bgra = convert_bgra
+        self.poll_interval = poll_interval
+        self.mission_start_timeout = mission_start_timeout
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._frame_shape = None
+        self._free_buffers = deque()
+        self._frame_queue = deque()
+        self._held_buffer = None
+        self._observation = None
+
+        self.has_mission_begun = False
+        self.is_mission_running = True
+        self.errors = []
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_taken = 0
+        self.observations_received = 0
+        self.observations_dropped = 0
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        start = time.perf_counter()
+        while not self._stop_event.is_set():
+            world_state = self.agent_host.getWorldState()
+            self.errors.extend(error.text for error in world_state.errors)
+            if not self.has_mission_begun:
+                if not world_state.has_mission_begun:
+                    if self.mission_start_timeout is not None and time.perf_counter() - start > self.mission_start_timeout:
+                        self.errors.append(f"Mission did not begin within {self.mission_start_timeout}s")
+                        self.is_mission_running = False
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                self.has_mission_begun = True
+
+            num_frames = world_state.number_of_video_frames_since_last_state
+            if num_frames > 0 and len(world_state.video_frames) > 0:
+                with self._lock:
+                    self.frames_dropped += num_frames - 1
+                self._push_frame(world_state.video_frames[-1])
+
+            num_observations = world_state.number_of_observations_since_last_state
+            if num_observations > 0 and len(world_state.observations) > 0:
+                observation = json.loads(world_state.observations[-1].text)
+                with self._lock:
+                    self.observations_dropped += num_observations - 1 + (self._observation is not None)
+                    self.observations_received += num_observations
+                    self._observation = observation
+
+            self.is_mission_running = world_state.is_mission_running
+            if not self.is_mission_running:
+                break
+            time.sleep(self.poll_interval)
+
+    def _allocate_buffers(self, shape):
+        # One buffer per queue slot, one being written and one held by the consumer
+        self._frame_shape = shape
+        self._free_buffers = deque(np.empty(shape, dtype=np.uint8) for _ in range(self.queue_size + 2))
+        self._frame_queue.clear()
+        self._held_buffer = None
+
+    def _push_frame(self, video_frame):
+        shape = (video_frame.height, video_frame.width, video_frame.channels)
+        with self._lock:
+            self.frames_received += 1
+            if shape != self._frame_shape:
+                self._allocate_buffers(shape)
+            if len(self._frame_queue) >= self.queue_size:
+                self.frames_dropped += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return
+                self._free_buffers.append(self._frame_queue.popleft())
+            buffer = self._free_buffers.popleft()
+
+        pixels = np.frombuffer(video_frame.pixels, dtype=np.uint8).reshape(shape)
+        if self.convert_bgra and shape[2] == 4:
+            cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGRA, dst=buffer)
+            cv2.flip(buffer, 0, dst=buffer)
+        else:
+            np.copyto(buffer, pixels[::-1])
+
+        with self._lock:
+            if buffer.shape == self._frame_shape:
+                self._frame_queue.append(buffer)
+
+    def take_frame(self):
+        """Returns the next queued frame without blocking, or None if there is no new frame.
+
+        The returned buffer stays valid until the next call to `take_frame`.
+        """
+        with self._lock:
+            if not self._frame_queue:
+                return None
+            if self._held_buffer is not None and self._held_buffer.shape == self._frame_shape:
+                self._free_buffers.append(self._held_buffer)
+            self._held_buffer = self._frame_queue.popleft()
+            self.frames_taken += 1
+            return self._held_buffer
+
+    def take_observation(self):
+        """Returns the newest observation dict if one arrived since the last call, otherwise None."""
+        with self._lock:
+            observation, self._observation = self._observation, None
+            return observation
+
+    @property
+    def counters(self):
+        return {
+            "frames_received": self.frames_received,
+            "frames_dropped": self.frames_dropped,
+            "frames_taken": self.frames_taken,
+            "observations_received": self.observations_received,
+            "observations_dropped": self.observations_dropped,
+        }
@@ -0,0 +1,58 @@
+from collections import deque
+import tkinter as tk
+
+
+DEFAULT_MAX_LINES = 5000
+DEFAULT_FLUSH_MS = 50
+
+
+class OutputConsole(object):
+    """Batches text written to a tk.Text and caps how many lines it keeps.
+
+    `write` only appends to a bounded ring buffer, so it is cheap and safe to call from any thread.
+    Every `flush_ms` the buffered text is added to the widget with a single `insert`, the widget is
+    scrolled to the end once, and the oldest lines beyond `max_lines` are deleted.
+    """
+    def __init__(self, text_widget: tk.Text, max_lines=DEFAULT_MAX_LINES, flush_ms=DEFAULT_FLUSH_MS, echo_stdout=True):
+        self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.flush_ms = flush_ms
+        self.echo_stdout = echo_stdout
+        self.pending = deque(maxlen=max_lines)
+        self.lines_dropped = 0
+        self._flush_id = None
+
+    def start(self):
+        if self._flush_id is None:
+            self._flush_id = self.text_widget.after(self.flush_ms, self._flush_tick)
+
+    def stop(self):
+        if self._flush_id is not None:
+            self.text_widget.after_cancel(self._flush_id)
+            self._flush_id = None
+        self.flush()
+
+    def write(self, text, tag):
+        if len(self.pending) == self.pending.maxlen:
+            self.lines_dropped += 1
+        self.pending.append((text + "\n", (tag,)))
+        if self.echo_stdout:
+            print(text)
+
+    def _flush_tick(self):
+        self.flush()
+        self._flush_id = self.text_widget.after(self.flush_ms, self._flush_tick)
+
+    def flush(self):
+        if not self.pending:
+            return
+        insert_args = []
+        while self.pending:
+            insert_args.extend(self.pending.popleft())
+        self.text_widget.insert(tk.END, *insert_args)
+
+        # Every line ends in a newline, so the position before Tk's own trailing newline is on an empty extra line
+        num_lines = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+        if num_lines > self.max_lines:
+            self.text_widget.delete("1.0", f"{num_lines - self.max_lines + 1}.0")
+        self.text_widget.yview_moveto(1.0)
@@ -0,0 +1,99 @@
+from math import ceil
+from pathlib import Path
+
+import numpy as np
+
+
+DEFAULT_MAX_POINTS = 20000
+DECIMATION_METHODS = ["voxel", "stride"]
+VOXEL_FIT_ITERATIONS = 6
+
+
+def points_from_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Flattens an `(rows, cols, 3)` xyz matrix, like the VOG's Dxyz matrix, into finite `(N, 3)` float32 points."""
+    points = np.asarray(matrix, dtype=np.float32).reshape(-1, matrix.shape[2])[:, :3]
+    return points[np.isfinite(points).all(axis=1)]
+
+
+def stride_decimate(points: np.ndarray, max_points=DEFAULT_MAX_POINTS) -> np.ndarray:
+    """Keeps every n-th point, with n chosen so no more than `max_points` remain."""
+    if len(points) <= max_points:
+        return points
+    return points[::ceil(len(points) / max_points)]
+
+
+def voxel_grid(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """Replaces the points in each occupied cube of side `voxel_size` with their centroid."""
+    cells = np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    cell_ids = np.ravel_multi_index(cells.T, dims)
+    _, inverse, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+    centroids = np.empty((len(counts), 3), dtype=np.float32)
+    for axis in range(3):
+        centroids[:, axis] = np.bincount(inverse, weights=points[:, axis], minlength=len(counts)) / counts
+    return centroids
+
+
+def voxel_decimate(points: np.ndarray, max_points=DEFAULT_MAX_POINTS) -> np.ndarray:
+    """Voxel-grid downsampling to at most `max_points`, keeping the cloud's spatial coverage even.
+
+    The voxel size is fitted over a few passes, since the number of occupied voxels depends on
+    the shape of the surface rather than on the cloud's bounding box. Any excess after the last
+    pass is removed by stride decimation.
+    """
+    if len(points) <= max_points:
+        return points
+    extent = float(np.max(points.max(axis=0) - points.min(axis=0)))
+    if extent == 0.0:
+        return points[:1]
+
+    # Camera point clouds are close to surfaces, so occupied voxels grow roughly with 1 / size^2
+    voxel_size = extent / np.sqrt(max_points)
+    decimated = voxel_grid(points, voxel_size)
+    for _ in range(VOXEL_FIT_ITERATIONS):
+        if max_points // 2 <= len(decimated) <= max_points:
+            break
+        voxel_size *= np.sqrt(len(decimated) / max_points)
+        decimated = voxel_grid(points, voxel_size)
+    return stride_decimate(decimated, max_points)
+
+
+def decimate(points: np.ndarray, max_points=DEFAULT_MAX_POINTS, method="voxel") -> np.ndarray:
+    if method == "voxel":
+        return voxel_decimate(points, max_points)
+    if method == "stride":
+        return stride_decimate(points, max_points)
+    raise ValueError(f"Unknown decimation method '{method}', expected one of {DECIMATION_METHODS}")
+
+
+def export_ply(path, points: np.ndarray):
+    """Writes `points` as a binary little-endian PLY file of float32 vertices."""
+    points = np.ascontiguousarray(points, dtype="<f4")
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        f"element vertex {len(points)}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        "end_header\n"
+    )
+    with Path(path).open("wb") as ply_f:
+        ply_f.write(header.encode("ascii"))
+        ply_f.write(points.tobytes())
+
+
+def export_npz(path, points: np.ndarray):
+    np.savez_compressed(path, points=points)
+
+
+def export_point_cloud(path, points: np.ndarray):
+    """Writes the full cloud as `.ply` or `.npz`, chosen by the suffix of `path`."""
+    path = Path(path)
+    if path.suffix == ".ply":
+        export_ply(path, points)
+    elif path.suffix == ".npz":
+        export_npz(path, points)
+    else:
+        raise ValueError(f"Unknown point cloud format '{path.suffix}', expected .ply or .npz")
+    return path
@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+
+NGRAM_SIZE = 3
+# Commands after which the set of loaded productions may have changed
+PRODUCTION_COMMANDS = {"source", "sp", "excise", "production"}
+
+
+def changes_productions(command: str) -> bool:
+    words = command.split(maxsplit=1)
+    return bool(words) and words[0] in PRODUCTION_COMMANDS
+
+
+def parse_production_names(print_text: str):
+    """Returns the production names listed by a bare `p`, one per line."""
+    return [line.split()[0] for line in print_text.splitlines() if line.strip()]
+
+
+def _grams(text: str):
+    """The distinct substrings of `text` up to `NGRAM_SIZE` long."""
+    return {text[start:start + size] for size in range(1, NGRAM_SIZE + 1) for start in range(len(text) - size + 1)}
+
+
+class ProductionIndex(object):
+    """A case-insensitive substring index of production names, built from n-grams of up to `NGRAM_SIZE` characters.
+
+    A query no longer than `NGRAM_SIZE` is a single posting lookup. A longer query intersects the
+    postings of its n-grams and checks the few names left. A query that extends the previous one,
+    as when typing, only filters the previous matches. Names that start with the query are
+    listed first.
+    """
+    def __init__(self, names=()):
+        self.names = set()
+        self.postings = defaultdict(set)
+        self._last_query = None
+        self._last_matches = None
+        self.update(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        if name in self.names:
+            return
+        self.names.add(name)
+        for gram in _grams(name.lower()):
+            self.postings[gram].add(name)
+        self._last_query = None
+
+    def remove(self, name):
+        if name not in self.names:
+            return
+        self.names.discard(name)
+        for gram in _grams(name.lower()):
+            posting = self.postings[gram]
+            posting.discard(name)
+            if not posting:
+                del self.postings[gram]
+        self._last_query = None
+
+    def clear(self):
+        self.names.clear()
+        self.postings.clear()
+        self._last_query = None
+
+    def update(self, names):
+        """Makes the index hold exactly `names`, touching only those added or removed. Returns `(added, removed)`."""
+        names = set(names)
+        added = names - self.names
+        removed = self.names - names
+        for name in removed:
+            self.remove(name)
+        for name in added:
+            self.add(name)
+        return added, removed
+
+    def _candidates(self, query):
+        if self._last_query is not None and self._last_query in query:
+            return [name for name in self._last_matches if query in name.lower()]
+        if len(query) <= NGRAM_SIZE:
+            return list(self.postings.get(query, ()))
+        postings = sorted((self.postings.get(query[start:start + NGRAM_SIZE], set())
+                           for start in range(len(query) - NGRAM_SIZE + 1)), key=len)
+        candidates = set.intersection(*postings)
+        return [name for name in candidates if query in name.lower()]
+
+    def search(self, query: str):
+        """Returns the names containing `query`, prefix matches first and each group sorted."""
+        query = query.strip().lower()
+        if not query:
+            return sorted(self.names)
+        matches = self._candidates(query)
+        self._last_query, self._last_matches = query, matches
+        return sorted(matches, key=lambda name: (not name.lower().startswith(query), name))
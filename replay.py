@@ -0,0 +1,113 @@
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import time
+
+import pysoarlib as psl
+
+from agent_connector import AgentConnector
+from episode_log import FRAME_EVENT, OBSERVATION_EVENT, EpisodeLog
+from vision_preprocessor import add_vision_arguments, vision_preprocessor_from_args
+
+
+def replay_episode(log: EpisodeLog, agent: psl.SoarClient, connector: AgentConnector, steps_per_frame=1):
+    """Feeds a recorded episode into `connector` as fast as Soar consumes it.
+
+    Observations are applied as they come and Soar is stepped after every frame. Returns the
+    replay statistics together with the actions the agent took and the ones it took when recorded.
+    """
+    replayed_actions = []
+    connector.action_handler = replayed_actions.append
+    decisions = 0
+    frames = 0
+
+    start = time.perf_counter()
+    for timestamp, kind, payload in log.events():
+        if kind == OBSERVATION_EVENT:
+            connector.update_info(payload)
+        elif kind == FRAME_EVENT:
+            connector.send_vision(payload)
+            agent.execute_command(f"step {steps_per_frame}", False)
+            decisions += steps_per_frame
+            frames += 1
+    wall_time = time.perf_counter() - start
+
+    recorded_actions = log.actions()
+    return {
+        "frames": frames,
+        "decisions": decisions,
+        "wall_time": wall_time,
+        "frames_per_sec": frames / wall_time if wall_time else 0.0,
+        "decisions_per_sec": decisions / wall_time if wall_time else 0.0,
+        "recorded_actions": recorded_actions,
+        "replayed_actions": replayed_actions,
+        "actions_match": recorded_actions == replayed_actions,
+    }
+
+
+if __name__ == "__main__":
+    #######################
+    # PARSE CLI ARGUMENTS #
+    #######################
+    cli = ArgumentParser(description="Replays recorded Malmo episodes into a Soar agent without a Minecraft client.")
+    cli.add_argument("episodes", type=Path, nargs='+', help="Episode directories written by EpisodeRecorder.")
+    cli.add_argument(
+        "-a", "--agent",
+        default="soar_agents/agent_gamma.soar",
+        type=Path,
+        help="The path to the .soar file which should be sourced for the agent."
+    )
+    cli.add_argument(
+        "-s", "--steps-per-frame",
+        default=1,
+        type=int,
+        help="Decision cycles to run after each replayed frame."
+    )
+    cli.add_argument(
+        "-t", "--frame-transport",
+        default="png",
+        type=str,
+        choices=["png", "shm"],
+        help="How frames are handed to SVS: inline base64 PNG, or raw bytes in a shared memory ring."
+    )
+    cli.add_argument(
+        "-o", "--output",
+        default=None,
+        type=Path,
+        help="Write the per-episode results to this JSON file."
+    )
+    add_vision_arguments(cli)
+    cli_namespace = cli.parse_args()
+
+    ######################
+    # CREATE SOAR CLIENT #
+    ######################
+    agent = psl.SoarClient(agent_name="replay",
+                            agent_source=str(cli_namespace.agent),
+                            write_to_stdout=False,
+                            watch_level=0)
+    minecraft_connector = AgentConnector(agent, frame_transport=cli_namespace.frame_transport,
+                                         vision_preprocessor=vision_preprocessor_from_args(cli_namespace))
+    minecraft_connector.add_output_command("take-action")
+    agent.add_connector("minecraft", minecraft_connector)
+
+    #################
+    # PROGRAM START #
+    #################
+    agent.connect()
+    results = []
+    for episode_path in cli_namespace.episodes:
+        agent.execute_command("soar init", False)
+        result = replay_episode(EpisodeLog(episode_path), agent, minecraft_connector, cli_namespace.steps_per_frame)
+        result["episode"] = str(episode_path)
+        results.append(result)
+        print(f"{episode_path}: {result['frames']} frames in {result['wall_time']:.2f}s "
+              f"({result['frames_per_sec']:.1f} frames/sec, {result['decisions_per_sec']:.1f} decisions/sec), "
+              f"actions {'match' if result['actions_match'] else 'DIFFER'}")
+
+    if cli_namespace.output is not None:
+        with cli_namespace.output.open("w") as output_f:
+            json.dump(results, output_f, indent=2)
+
+    agent.kill()
+    minecraft_connector.frame_transport.close()
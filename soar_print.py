@@ -0,0 +1,28 @@
+import re
+
+
+# Every alternative is built from flat character classes, so scanning is linear with no backtracking
+_SYMBOL = r"\|[^|\\]*(?:\\.[^|\\]*)*\||[^\s()|]+"
+WME_PATTERN = re.compile(rf"""
+    \((?P<id>{_SYMBOL})
+  | \^(?P<attr>{_SYMBOL})\s+(?P<value>{_SYMBOL})(?P<acceptable>\s+\+(?=[\s)]))?
+  | (?P<close>\))
+""", re.VERBOSE | re.DOTALL)
+
+
+def iter_wmes(print_text):
+    """Yields `(id, attr, value, is_acceptable)` for every WME in the output of a Soar `print` command.
+
+    The text is scanned once. `|quoted strings|` are kept whole, including any spaces or
+    parentheses inside them, and keep their surrounding pipes as Soar prints them.
+    """
+    node_id = None
+    for match in WME_PATTERN.finditer(print_text):
+        attr, value, acceptable, close = match.group("attr", "value", "acceptable", "close")
+        if attr is not None:
+            if node_id is not None:
+                yield node_id, attr, value, acceptable is not None
+        elif close is not None:
+            node_id = None
+        else:
+            node_id = match.group("id")
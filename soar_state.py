@@ -1,68 +1,94 @@
 from collections import defaultdict
-import re
 
-
-NODE_PATTERN = re.compile("\((\w\d+)(([ \n]+\^([!-~]+)[ \n]+([!-~ ]+))*)\)")
-ATTRIBUTE_PATTERN = re.compile("\^([\w\d\-_]+)\s+([\w\d\-_*.]+|\|.*\|)")
+from soar_print import iter_wmes
+from treeview_reconciler import placeholder_row
+from wme_store import WMEStore
 
 
 class SoarState(object):
-    def __init__(self) -> None:
-        self.node_ids = set()
-        self.nodes = defaultdict(lambda: defaultdict(list))
+    """The WMEs of a `print S1 -d N`, kept in a `WMEStore` so they can be queried as well as walked."""
+    def __init__(self, store: WMEStore = None) -> None:
+        self.store = store if store is not None else WMEStore()
+
+    @property
+    def node_ids(self):
+        return self.store.identifiers()
 
     def parse_state_text(self, state_text):
-        self.node_ids.clear()
-        self.nodes.clear()
-
-        node_matches = re.finditer(NODE_PATTERN, state_text)
-        for node_match in node_matches:
-            node_text = node_match.group(0)
-            node_id = node_match.group(1)
-            self.node_ids.add(node_id)
-            
-            attr_matches = re.finditer(ATTRIBUTE_PATTERN, node_text)
-            for attr_match in attr_matches:
-                attr_name = attr_match.group(1)
-                attr_val = attr_match.group(2)
-                self.nodes[node_id][attr_name].append(attr_val)
-
-    def iter(self, node_id="S1", parent="", visited=set()) -> tuple[str, str, str]:
-        visited_nodes = set().union(visited)
-        visited_nodes.add(node_id)
-        active_node = node_id
-
-        attrs = self.nodes[active_node]
-        for attr, vals in attrs.items():
-            for val in vals:
-                if val not in self.node_ids:
-                    yield active_node, attr, val, False
-                else:
-                    if val not in visited_nodes:
-                        yield active_node, attr, val, True
-                        yield from self.iter(node_id=val, parent=active_node, visited=visited_nodes)
-                    else:
-                        yield active_node, attr, val, False
-
-    def insert_in_treeview(self, treeview, node_id="S1", parent_tree_id="S1", visited=set()):
-        visited_nodes = set().union(visited)
-        visited_nodes.add(node_id)
-        active_node = node_id
-
-        attrs = self.nodes[active_node]
-        for attr, vals in attrs.items():
-            for val in vals:
-                if val not in self.node_ids:
-                    treeview.insert(parent_tree_id, 'end', text=attr, values=(val,))
-                else:
-                    new_tree_id = treeview.insert(parent_tree_id, 0, text=attr, values=(val,))
-                    if val not in visited_nodes:
-                        self.insert_in_treeview(treeview, node_id=val, parent_tree_id=new_tree_id, visited=visited_nodes)
+        self.store.clear()
+        self.store.extend(iter_wmes(state_text))
 
+    def ids_with(self, attr, value=None):
+        return self.store.ids_with(attr, value)
 
-if __name__ == "__main__":
-    demo_text =\
-"""(S1 ^epmem E1 ^io I1
+    def parents_of(self, node_id):
+        return self.store.parents_of(node_id)
+
+    def iter(self, node_id="S1"):
+        """Yields `(id, attr, val, expanded)` depth first, expanding each identifier at its first occurrence only."""
+        store = self.store
+        symbols = store.symbols.symbols
+        by_id, attrs, values = store.by_id, store.attrs, store.values
+        root_sym = store.symbols.lookup(node_id)
+        if root_sym not in by_id:
+            return
+
+        visited = {root_sym}
+        stack = [(root_sym, iter(by_id[root_sym]))]
+        while stack:
+            active_sym, wmes = stack[-1]
+            wme = next(wmes, None)
+            if wme is None:
+                stack.pop()
+                continue
+            val_sym = values[wme]
+            if val_sym in visited or val_sym not in by_id:
+                yield symbols[active_sym], symbols[attrs[wme]], symbols[val_sym], False
+            else:
+                visited.add(val_sym)
+                yield symbols[active_sym], symbols[attrs[wme]], symbols[val_sym], True
+                stack.append((val_sym, iter(by_id[val_sym])))
+
+    def _node_rows(self, node_id, parent_tree_id):
+        id_rows = []
+        const_rows = []
+        seen_counts = defaultdict(int)
+        for attr, val in self.store.wmes_of(node_id):
+            row_key = f"{attr} {val}"
+            tree_id = f"{parent_tree_id}/{row_key}#{seen_counts[row_key]}"
+            seen_counts[row_key] += 1
+            if self.store.is_identifier(val):
+                id_rows.append((tree_id, parent_tree_id, attr, val))
+            else:
+                const_rows.append((tree_id, parent_tree_id, attr, val))
+        # Identifier-valued WMEs are listed first, in reverse order, ahead of constant-valued WMEs
+        return [(row, True) for row in reversed(id_rows)] + [(row, False) for row in const_rows]
+
+    def tree_rows(self, node_id="S1", parent_tree_id="S1", expanded=None):
+        """Yields `(tree_id, parent_tree_id, attr, val)` rows with tree ids that are stable between cycles.
+
+        If `expanded` is given, only rows whose tree id is in it are descended into, and the others
+        get a placeholder child instead.
+        """
+        visited = {node_id}
+        stack = [iter(self._node_rows(node_id, parent_tree_id))]
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+            row, is_identifier = entry
+            yield row
+            val = row[3]
+            if is_identifier and val not in visited:
+                if expanded is not None and row[0] not in expanded:
+                    yield placeholder_row(row[0])
+                    continue
+                visited.add(val)
+                stack.append(iter(self._node_rows(val, row[0])))
+
+
+SAMPLE_STATE_TEXT = """(S1 ^epmem E1 ^io I1
        ^name agent_gamma ^operator O2 + ^reward-link R1 ^smem L1
        ^superstate nil ^svs V1 ^top-state S1 ^type state)
   (E1 ^command C1 ^present-id 1 ^result R2)
@@ -74,15 +100,15 @@ if __name__ == "__main__":
     (V4 ^size 0 ^visual-buffer V5 ^vog V6)
       (V5 ^frames F1 ^newest-update 32649 ^oldest-update 0 ^size 0)
 """
-    nodes = re.finditer(NODE_PATTERN, demo_text)
-    for n in nodes:
-        node_text = n.group(0)
-        print(node_text)
-        attrs = re.finditer(ATTRIBUTE_PATTERN, node_text)
-        for a in attrs:
-            print(f"\t{a.group(1)} = {a.group(2)}")
+
+
+if __name__ == "__main__":
+    for wme in iter_wmes(SAMPLE_STATE_TEXT):
+        print(wme)
 
     state = SoarState()
-    state.parse_state_text(demo_text)
+    state.parse_state_text(SAMPLE_STATE_TEXT)
     for n in state.iter():
         print(n)
+    print(f"ids with ^name create-vog: {state.ids_with('name', 'create-vog')}")
+    print(f"parents of V5: {state.parents_of('V5')}")
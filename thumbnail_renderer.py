@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from matrix_viewer import show_matrix_as_heatmap, show_matrix_as_image, show_matrix_as_points
+
+
+THUMBNAIL_CACHE_DIR = Path(".thumbnail_cache")
+THUMBNAIL_DPI = 100
+DEFAULT_MAX_CACHED_THUMBNAILS = 1000
+THUMBNAIL_MAX_POINTS = 5000
+RENDER_MODES = {
+    "image": show_matrix_as_image,
+    "heatmap": show_matrix_as_heatmap,
+    "points": show_matrix_as_points,
+}
+
+
+def thumbnail_key(matrix: np.ndarray, render_mode: str, thumbnail_size=None) -> str:
+    """Hashes the matrix contents together with everything else that changes how it is drawn."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{render_mode}|{thumbnail_size}|{matrix.dtype.str}|{matrix.shape}".encode())
+    digest.update(np.ascontiguousarray(matrix).data)
+    return digest.hexdigest()
+
+
+def thumbnail_path_for(key: str) -> Path:
+    return THUMBNAIL_CACHE_DIR / f"{key}.png"
+
+
+def render_thumbnail(matrix, render_mode, out_path, thumbnail_size=None):
+    """Draws `matrix` with the matrix_viewer function for `render_mode` and saves it to `out_path`.
+
+    `matrix` may be an array or the path of a `.npy` file, which is memory-mapped. If
+    `thumbnail_size` is given as `(width, height)` in pixels the figure is shrunk to it.
+    """
+    if not isinstance(matrix, np.ndarray):
+        matrix = np.load(matrix, mmap_mode="r", allow_pickle=False)
+
+    render_kwargs = {"max_points": THUMBNAIL_MAX_POINTS} if render_mode == "points" and thumbnail_size is not None else {}
+    fig, axes = RENDER_MODES[render_mode](matrix, **render_kwargs)
+    if thumbnail_size is not None:
+        width, height = thumbnail_size
+        fig.set_size_inches(width / THUMBNAIL_DPI, height / THUMBNAIL_DPI)
+        for ax in np.ravel(axes):
+            ax.set_axis_off()
+    out_path = Path(out_path)
+    tmp_path = out_path.with_name(out_path.stem + f".{os.getpid()}.tmp.png")
+    fig.savefig(tmp_path, dpi=THUMBNAIL_DPI)
+    plt.close(fig)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _init_render_worker():
+    plt.switch_backend("Agg")
+
+
+class ThumbnailRenderer(object):
+    """Renders matrix thumbnails over a process pool, skipping any whose content hash is already cached.
+
+    The cache holds at most `max_cached` thumbnails; beyond that the least recently used are deleted.
+    Use order is kept in file modification times, so it carries over between runs.
+    """
+    def __init__(self, max_workers=None, thumbnail_size=None, max_cached=DEFAULT_MAX_CACHED_THUMBNAILS):
+        self.max_workers = max_workers
+        self.thumbnail_size = thumbnail_size
+        self.max_cached = max_cached
+        self._pool = None
+        self._cached = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_render_worker)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _load_cache_index(self):
+        cached = sorted(THUMBNAIL_CACHE_DIR.glob("*.png"), key=lambda path: path.stat().st_mtime)
+        self._cached = OrderedDict((path, None) for path in cached if not path.name.endswith(".tmp.png"))
+
+    def _touch(self, out_path):
+        self._cached[out_path] = None
+        self._cached.move_to_end(out_path)
+
+    def _evict(self):
+        while len(self._cached) > self.max_cached:
+            out_path, _ = self._cached.popitem(last=False)
+            out_path.unlink(missing_ok=True)
+
+    def render(self, jobs):
+        """Renders `(matrix, npy_path, render_mode)` jobs, returning the thumbnail path of each job in order.
+
+        The matrix is only used for hashing; workers re-open it from `npy_path`.
+        """
+        THUMBNAIL_CACHE_DIR.mkdir(exist_ok=True)
+        if self._cached is None:
+            self._load_cache_index()
+        thumbnail_paths = []
+        pending = {}
+        for matrix, npy_path, render_mode in jobs:
+            out_path = thumbnail_path_for(thumbnail_key(matrix, render_mode, self.thumbnail_size))
+            thumbnail_paths.append(out_path)
+            if out_path in pending:
+                continue
+            if out_path.exists():
+                os.utime(out_path)
+                self._touch(out_path)
+                continue
+            pending[out_path] = self.pool.submit(render_thumbnail, str(npy_path), render_mode, out_path, self.thumbnail_size)
+
+        for out_path, future in pending.items():
+            future.result()
+            self._touch(out_path)
+        self._evict()
+        return thumbnail_paths
@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+
+PLACEHOLDER_SUFFIX = "/..."
+
+
+def placeholder_row(parent_iid):
+    """A stand-in child that gives a collapsed row its expand arrow until the real children are generated."""
+    return parent_iid + PLACEHOLDER_SUFFIX, parent_iid, "...", ()
+
+
+class TreeviewReconciler(object):
+    """Keeps a ttk.Treeview in sync with a freshly generated list of rows by only touching the rows that changed.
+
+    Rows are `(iid, parent_iid, text, values)` tuples given parents-first in display order. Because
+    the iids are stable between refreshes, the open/closed state of surviving rows is preserved.
+
+    `expanded` holds the iids the user has opened. Row generators that take it only generate the
+    children of expanded rows, plus a `placeholder_row` under collapsed ones, so the cost of a
+    refresh follows what is visible rather than the size of the whole tree.
+    """
+    def __init__(self, treeview, root_iid):
+        self.treeview = treeview
+        self.root_iid = root_iid
+        self.rows = {}
+        self.children = defaultdict(list)
+        self.expanded = set()
+
+    def clear(self):
+        self.treeview.delete(*self.treeview.get_children(self.root_iid))
+        self.rows.clear()
+        self.children.clear()
+        self.expanded.clear()
+
+    def bind_expansion(self, refresh):
+        """Tracks rows being opened and closed, calling `refresh` to regenerate the rows after each."""
+        def on_open(event):
+            self.expanded.add(self.treeview.focus())
+            refresh()
+
+        def on_close(event):
+            self.expanded.discard(self.treeview.focus())
+            refresh()
+
+        self.treeview.bind("<<TreeviewOpen>>", on_open)
+        self.treeview.bind("<<TreeviewClose>>", on_close)
+
+    def reconcile(self, rows):
+        new_rows = {}
+        new_children = defaultdict(list)
+        for iid, parent, text, values in rows:
+            values = tuple(str(v) for v in values)
+            new_rows[iid] = (parent, text, values)
+            new_children[parent].append(iid)
+
+        removed = self.rows.keys() - new_rows.keys()
+        removed |= self._orphaned_by(removed)
+        top_removed = [iid for iid in removed if self.rows[iid][0] not in removed]
+        if top_removed:
+            self.treeview.delete(*top_removed)
+
+        current_children = {parent: [iid for iid in iids if iid not in removed] for parent, iids in self.children.items()}
+        for iid, (parent, text, values) in new_rows.items():
+            old_row = self.rows.get(iid) if iid not in removed else None
+            if old_row is None:
+                self.treeview.insert(parent, 'end', iid, text=text, values=values, open=iid in self.expanded)
+                current_children.setdefault(parent, []).append(iid)
+                continue
+
+            old_parent, old_text, old_values = old_row
+            if old_parent != parent:
+                current_children[old_parent].remove(iid)
+            if old_text != text or old_values != values:
+                self.treeview.item(iid, text=text, values=values)
+
+        for parent, iids in new_children.items():
+            if current_children.get(parent) != iids:
+                self.treeview.set_children(parent, *iids)
+
+        self.rows = new_rows
+        self.children = new_children
+        self.expanded &= new_rows.keys()
+
+    def _orphaned_by(self, removed):
+        # Deleting a row also deletes everything under it, even rows that are still wanted elsewhere
+        orphaned = set()
+        stack = list(removed)
+        while stack:
+            for child in self.children.get(stack.pop(), ()):
+                if child not in removed and child not in orphaned:
+                    orphaned.add(child)
+                    stack.append(child)
+        return orphaned
@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+
+from frame_transport import DEFAULT_FRAME_SHAPE
+
+
+INTERPOLATIONS = {"area": cv2.INTER_AREA, "nearest": cv2.INTER_NEAREST}
+# Channel order of the frames handed out by the observation pump: BGR colour plus Malmo's depth
+CHANNEL_NAMES = "bgrd"
+VISION_DTYPES = ["uint8", "float16"]
+
+
+class VisionPreprocessor(object):
+    """Crops, downscales and selects channels of each frame before it is injected into SVS.
+
+    `roi` is an `(x, y, width, height)` crop in source pixels, applied before scaling. `channels`
+    is a string of `CHANNEL_NAMES` that includes `"d"`, e.g. `"d"` for depth only, or None for all of them. The output
+    shape is fixed by `source_shape`, so it can be published on the input-link before the first
+    frame arrives; every SVS matrix the VOG creates shrinks with it. Cropping narrows the field of
+    view, which the agent's Fh/Fv matrices do not know about.
+    """
+    def __init__(self, source_shape=DEFAULT_FRAME_SHAPE, scale=1.0, interpolation="area", roi=None, channels=None, dtype="uint8"):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation '{interpolation}', expected one of {list(INTERPOLATIONS)}")
+        if dtype not in VISION_DTYPES:
+            raise ValueError(f"Unknown vision dtype '{dtype}', expected one of {VISION_DTYPES}")
+        if scale <= 0.0 or scale > 1.0:
+            raise ValueError(f"Vision scale must be in (0, 1], got {scale}")
+        source_rows, source_cols = source_shape[:2]
+        source_chans = source_shape[2] if len(source_shape) > 2 else 1
+        if roi is not None:
+            x, y, width, height = roi
+            if x < 0 or y < 0 or width <= 0 or height <= 0 or x + width > source_cols or y + height > source_rows:
+                raise ValueError(f"Region of interest {roi} does not fit in a {source_cols}x{source_rows} frame")
+        channels = CHANNEL_NAMES[:source_chans] if channels is None else channels
+        if not channels or any(name not in CHANNEL_NAMES[:source_chans] for name in channels):
+            raise ValueError(f"Unknown vision channels '{channels}', expected letters of '{CHANNEL_NAMES[:source_chans]}'")
+        # The agent's VOG extracts its D matrix from the depth channel and stalls without one
+        if "d" not in channels:
+            raise ValueError(f"Vision channels '{channels}' must include the depth channel 'd'")
+
+        self.source_shape = tuple(source_shape)
+        self.scale = scale
+        self.interpolation = interpolation
+        self.roi = tuple(roi) if roi is not None else (0, 0, source_cols, source_rows)
+        self.channels = channels
+        self.channel_indices = [CHANNEL_NAMES.index(name) for name in channels]
+        self.dtype = np.dtype(dtype)
+
+        crop_cols, crop_rows = self.roi[2:]
+        self.output_shape = (max(1, round(crop_rows * scale)), max(1, round(crop_cols * scale)), len(channels))
+        self.keeps_channels = self.channel_indices == list(range(source_chans)) and self.dtype == np.uint8
+        self.is_identity = self.keeps_channels and self.scale == 1.0 and self.roi == (0, 0, source_cols, source_rows)
+        self._scaled = None
+        self._output = np.empty(self.output_shape, dtype=self.dtype)
+
+    @property
+    def depth_channel(self):
+        """The index of the depth channel in processed frames."""
+        return self.channels.index("d")
+
+    def resolution(self) -> dict:
+        """The processed frame layout, in the form the `vision` input-link schema entry expects."""
+        return {"width": self.output_shape[1], "height": self.output_shape[0], "channels": self.output_shape[2],
+                "depth-channel": self.depth_channel}
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        """Returns the processed frame. The result is a reused buffer, valid until the next call."""
+        if self.is_identity:
+            return frame
+        if frame.shape != self.source_shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the configured source shape {self.source_shape}")
+        x, y, width, height = self.roi
+        cropped = frame[y:y + height, x:x + width]
+        rows, cols = self.output_shape[:2]
+        if (rows, cols) != (height, width):
+            if self.keeps_channels:
+                cv2.resize(cropped, (cols, rows), dst=self._output, interpolation=INTERPOLATIONS[self.interpolation])
+                return self._output
+            if self._scaled is None:
+                self._scaled = np.empty((rows, cols, frame.shape[2]), dtype=frame.dtype)
+            cv2.resize(cropped, (cols, rows), dst=self._scaled, interpolation=INTERPOLATIONS[self.interpolation])
+            cropped = self._scaled
+        for out_chan, in_chan in enumerate(self.channel_indices):
+            np.copyto(self._output[:, :, out_chan], cropped[:, :, in_chan], casting="unsafe")
+        return self._output
+
+
+def add_vision_arguments(cli):
+    cli.add_argument(
+        "--vision-scale",
+        default=1.0,
+        type=float,
+        help="Downscale frames by this factor before SVS sees them; SVS matrix work shrinks with its square."
+    )
+    cli.add_argument(
+        "--vision-interpolation",
+        default="area",
+        choices=list(INTERPOLATIONS),
+        help="How frames are downscaled."
+    )
+    cli.add_argument(
+        "--vision-roi",
+        default=None,
+        type=int,
+        nargs=4,
+        metavar=("X", "Y", "WIDTH", "HEIGHT"),
+        help="Crop frames to this region, in source pixels, before downscaling."
+    )
+    cli.add_argument(
+        "--vision-channels",
+        default=None,
+        type=str,
+        help=f"The channels to send to SVS as letters of '{CHANNEL_NAMES}', e.g. 'd' for depth only. Must include 'd'. Defaults to all."
+    )
+    cli.add_argument(
+        "--vision-dtype",
+        default="uint8",
+        choices=VISION_DTYPES,
+        help="The element type of frames sent to SVS. float16 needs the shm frame transport."
+    )
+
+
+def vision_preprocessor_from_args(cli_namespace, source_shape=DEFAULT_FRAME_SHAPE) -> VisionPreprocessor:
+    return VisionPreprocessor(source_shape, scale=cli_namespace.vision_scale, interpolation=cli_namespace.vision_interpolation,
+                              roi=cli_namespace.vision_roi, channels=cli_namespace.vision_channels, dtype=cli_namespace.vision_dtype)
@@ -0,0 +1,141 @@
+from argparse import ArgumentParser
+
+from frame_transport import DEFAULT_FRAME_SHAPE
+from vision_preprocessor import add_vision_arguments, vision_preprocessor_from_args
+from vog_parser import SAMPLE_VOG_TEXT, VOG
+
+
+CONSTANT = "constant"
+POSE_DEPENDENT = "pose-dependent"
+FRAME_DEPENDENT = "frame-dependent"
+DEPENDENCE_RANK = {CONSTANT: 0, POSE_DEPENDENT: 1, FRAME_DEPENDENT: 2}
+
+# The fill matrices that elaborations/vog-updates keep in sync with the agent's pose
+POSE_NODE_NAMES = {
+    "pitch": "agent pitch matrix",
+    "yaw": "agent yaw matrix",
+}
+FRAME_OPS = ["get-from-vsm"]
+
+# Rough relative cost per output element, so trig ops weigh more than a copy
+OP_COST_WEIGHTS = {
+    "apply-unary-op": 4.0,
+    "div-mats": 2.0,
+    "stack-matrices": 1.0,
+    "extract-channel": 1.0,
+    "get-from-vsm": 1.0,
+}
+
+
+def classify_nodes(vog: VOG):
+    """Returns whether each node is constant, depends on the agent's pose, or depends on the frame."""
+    pose_names = set(POSE_NODE_NAMES.values())
+    classes = {}
+    for n_id in vog.topological_order():
+        node = vog.nodes[n_id]
+        if node.node_op in FRAME_OPS:
+            classes[n_id] = FRAME_DEPENDENT
+        elif node.node_name in pose_names:
+            classes[n_id] = POSE_DEPENDENT
+        else:
+            parent_classes = [classes[p_id] for p_id in node.parent_dict.values() if p_id in classes]
+            classes[n_id] = max(parent_classes, key=DEPENDENCE_RANK.get, default=CONSTANT)
+    return classes
+
+
+def recompute_schedule(vog: VOG, edited_ids):
+    """Returns the edited nodes and everything downstream of them, in topological order."""
+    dirty = set(edited_ids)
+    schedule = []
+    for n_id in vog.topological_order():
+        if n_id in dirty or any(p_id in dirty for p_id in vog.nodes[n_id].parent_dict.values()):
+            dirty.add(n_id)
+            schedule.append(n_id)
+    return schedule
+
+
+def per_frame_schedule(vog: VOG, pose_changed=True):
+    """Returns the nodes that must be recomputed for a new frame, and for a new pose if `pose_changed`."""
+    edited = [n_id for n_id, n in vog.nodes.items() if n.node_op in FRAME_OPS]
+    if pose_changed:
+        edited += [n_id for n_id, n in vog.nodes.items() if n.node_name in POSE_NODE_NAMES.values()]
+    return recompute_schedule(vog, edited)
+
+
+def infer_shapes(vog: VOG, frame_shape=DEFAULT_FRAME_SHAPE):
+    """Returns the `(rows, cols, chans)` of each node, given the shape of injected frames, e.g. `VisionPreprocessor.output_shape`."""
+    shapes = {}
+    for n_id in vog.topological_order():
+        node = vog.nodes[n_id]
+        attrs = node.attributes
+        parents = {name: shapes.get(p_id) for name, p_id in node.parent_dict.items()}
+        if node.node_op in FRAME_OPS:
+            shapes[n_id] = tuple(frame_shape)
+        elif "size-x" in attrs and "size-y" in attrs:
+            shapes[n_id] = (int(attrs["size-y"][0]), int(attrs["size-x"][0]), 1)
+        elif node.node_op == "extract-channel" and parents.get("source"):
+            shapes[n_id] = parents["source"][:2] + (1,)
+        elif node.node_op == "stack-matrices" and parents.get("a") and parents.get("b"):
+            shapes[n_id] = parents["a"][:2] + (parents["a"][2] + parents["b"][2],)
+        elif parents.get("a") and parents.get("b"):
+            shapes[n_id] = tuple(max(a, b) for a, b in zip(parents["a"], parents["b"]))
+        elif parents.get("source"):
+            shapes[n_id] = parents["source"]
+    return shapes
+
+
+def node_costs(vog: VOG, frame_shape=DEFAULT_FRAME_SHAPE):
+    """Estimates the cost of evaluating each node as its output element count times an op weight."""
+    costs = {}
+    for n_id, shape in infer_shapes(vog, frame_shape).items():
+        rows, cols, chans = shape
+        costs[n_id] = rows * cols * chans * OP_COST_WEIGHTS.get(vog.nodes[n_id].node_op, 1.0)
+    return costs
+
+
+def fold_candidates(vog: VOG, frame_shape=DEFAULT_FRAME_SHAPE):
+    """Finds the constant subgraphs that feed non-constant nodes.
+
+    Returns `(node_id, subgraph_node_ids, subgraph_cost)` for each constant node read by a pose- or
+    frame-dependent node, most expensive first. Each such subgraph could be folded into one constant.
+    """
+    classes = classify_nodes(vog)
+    costs = node_costs(vog, frame_shape)
+    candidates = []
+    for n_id, n_class in classes.items():
+        if n_class != CONSTANT:
+            continue
+        if not any(classes.get(c_id, CONSTANT) != CONSTANT for c_id in vog.nodes[n_id].children):
+            continue
+        subgraph = set()
+        stack = [n_id]
+        while stack:
+            s_id = stack.pop()
+            if s_id in subgraph or s_id not in classes:
+                continue
+            subgraph.add(s_id)
+            stack.extend(vog.nodes[s_id].parent_dict.values())
+        candidates.append((n_id, sorted(subgraph), sum(costs.get(s_id, 0.0) for s_id in subgraph)))
+    return sorted(candidates, key=lambda c: c[2], reverse=True)
+
+
+if __name__ == "__main__":
+    cli = ArgumentParser(description="Classifies and costs the nodes of the sample VOG at the resolution frames are injected at.")
+    add_vision_arguments(cli)
+    frame_shape = vision_preprocessor_from_args(cli.parse_args()).output_shape
+
+    vog = VOG()
+    vog.parse_vog_text(SAMPLE_VOG_TEXT)
+    classes = classify_nodes(vog)
+    costs = node_costs(vog, frame_shape)
+
+    for n_id in vog.topological_order():
+        node = vog.nodes[n_id]
+        print(f"{n_id:>3} {node.node_name:<22} {node.node_op:<24} {classes[n_id]:<16} {costs.get(n_id, 0):>12.0f}")
+
+    schedule = per_frame_schedule(vog)
+    print(f"\nPer-frame recompute ({len(schedule)}/{len(classes)} nodes, "
+          f"{sum(costs.get(n_id, 0) for n_id in schedule):.0f}/{sum(costs.values()):.0f} cost): {schedule}")
+    print("\nFold candidates:")
+    for n_id, subgraph, cost in fold_candidates(vog, frame_shape):
+        print(f"{n_id:>3} {vog.nodes[n_id].node_name:<22} {cost:>12.0f} from nodes {subgraph}")
@@ -0,0 +1,161 @@
+import time
+
+import numpy as np
+
+from matrix_cache import load_matrix
+from vog_analysis import POSE_NODE_NAMES, per_frame_schedule
+from vog_parser import SAMPLE_VOG_TEXT, VOG
+
+
+ARITHMETIC_OPS = {
+    "add-mats": np.add,
+    "sub-mats": np.subtract,
+    "mul-mats": np.multiply,
+    "div-mats": np.divide,
+}
+
+
+class VOGExecutor(object):
+    """Evaluates a parsed VOG with NumPy, as a reference for what SVS computes.
+
+    Every node gets one output buffer, allocated on the first run and reused afterwards with
+    in-place ufuncs, so repeated runs on new frames do not allocate. After the first run only the
+    frame-dependent nodes, plus the pose-dependent ones when the pose changed, are recomputed.
+    `sin` and `cos` take their arguments in degrees, matching the pitch/yaw matrices the agent builds.
+    """
+    def __init__(self, vog: VOG, dtype=np.float32, trig_in_degrees=True):
+        self.vog = vog
+        self.dtype = np.dtype(dtype)
+        self.trig_in_degrees = trig_in_degrees
+        self.order = vog.topological_order()
+        self.frame_schedule = per_frame_schedule(vog, pose_changed=False)
+        self.pose_schedule = per_frame_schedule(vog, pose_changed=True)
+        self._last_pose = None
+        self.outputs = {}
+        self._fill_vals = {}
+        self._pose_node_ids = {
+            pose_key: n_id for n_id, n in vog.nodes.items()
+            for pose_key, node_name in POSE_NODE_NAMES.items() if n.node_name == node_name
+        }
+
+    def node_by_name(self, node_name):
+        for n_id in self.order:
+            if self.vog.nodes[n_id].node_name == node_name:
+                return n_id
+        raise KeyError(node_name)
+
+    def output(self, node_name):
+        return self.outputs[self.node_by_name(node_name)]
+
+    def run(self, frame, pitch=0.0, yaw=0.0):
+        """Evaluates every node for `frame` (the BGRA-D image SVS sees) and the agent's pose.
+
+        Returns a dict of node id to output buffer. The buffers are overwritten by the next run.
+        """
+        fill_overrides = {}
+        if "pitch" in self._pose_node_ids:
+            fill_overrides[self._pose_node_ids["pitch"]] = pitch
+        if "yaw" in self._pose_node_ids:
+            fill_overrides[self._pose_node_ids["yaw"]] = yaw
+
+        if self._last_pose is None:
+            schedule = self.order
+        elif self._last_pose != (pitch, yaw):
+            schedule = self.pose_schedule
+        else:
+            schedule = self.frame_schedule
+        self._last_pose = (pitch, yaw)
+
+        for n_id in schedule:
+            self._run_node(n_id, frame, fill_overrides)
+        return self.outputs
+
+    def _buffer(self, n_id, shape):
+        buffer = self.outputs.get(n_id)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=self.dtype)
+            self.outputs[n_id] = buffer
+            self._fill_vals.pop(n_id, None)
+        return buffer
+
+    def _run_node(self, n_id, frame, fill_overrides):
+        node = self.vog.nodes[n_id]
+        op = node.node_op
+        attrs = node.attributes
+
+        if op == "get-from-vsm":
+            if frame.ndim == 2:
+                frame = frame[:, :, np.newaxis]
+            np.copyto(self._buffer(n_id, frame.shape), frame, casting="unsafe")
+
+        elif op == "create-float-filled-mat":
+            shape = (int(attrs["size-y"][0]), int(attrs["size-x"][0]), 1)
+            fill_val = fill_overrides.get(n_id, float(attrs["fill-val"][0]))
+            buffer = self._buffer(n_id, shape)
+            if self._fill_vals.get(n_id) != fill_val:
+                buffer.fill(fill_val)
+                self._fill_vals[n_id] = fill_val
+
+        elif op in ["create-x-coord-mat", "create-y-coord-mat"]:
+            shape = (int(attrs["size-y"][0]), int(attrs["size-x"][0]), 1)
+            if n_id not in self.outputs:
+                buffer = self._buffer(n_id, shape)
+                if op == "create-x-coord-mat":
+                    buffer[...] = np.arange(shape[1], dtype=self.dtype)[np.newaxis, :, np.newaxis]
+                else:
+                    buffer[...] = np.arange(shape[0], dtype=self.dtype)[:, np.newaxis, np.newaxis]
+
+        elif op in ARITHMETIC_OPS:
+            a = self.outputs[node.parent_dict["a"]]
+            b = self.outputs[node.parent_dict["b"]]
+            out = self._buffer(n_id, np.broadcast_shapes(a.shape, b.shape))
+            ARITHMETIC_OPS[op](a, b, out=out)
+
+        elif op == "apply-unary-op":
+            source = self.outputs[node.parent_dict["source"]]
+            out = self._buffer(n_id, source.shape)
+            unary_op = attrs["unary-op"][0]
+            if unary_op == "negate":
+                np.negative(source, out=out)
+            elif unary_op in ["sin", "cos"]:
+                if self.trig_in_degrees:
+                    np.deg2rad(source, out=out)
+                    source = out
+                (np.sin if unary_op == "sin" else np.cos)(source, out=out)
+            else:
+                raise ValueError(f"Unknown unary op '{unary_op}' on node {n_id}")
+
+        elif op == "extract-channel":
+            source = self.outputs[node.parent_dict["source"]]
+            channel = int(attrs["channel"][0])
+            out = self._buffer(n_id, source.shape[:2] + (1,))
+            np.copyto(out, source[:, :, channel:channel+1])
+
+        elif op == "stack-matrices":
+            a = self.outputs[node.parent_dict["a"]]
+            b = self.outputs[node.parent_dict["b"]]
+            out = self._buffer(n_id, a.shape[:2] + (a.shape[2] + b.shape[2],))
+            np.concatenate([a, b], axis=2, out=out)
+
+        else:
+            raise ValueError(f"Unsupported op '{op}' on node {n_id}")
+
+    def compare_with_dump(self, n_id):
+        """Returns the largest absolute difference between this executor's output and SVS's `node-N.json` dump."""
+        dumped = load_matrix(f"node-{n_id}.json")
+        return float(np.max(np.abs(self.outputs[n_id] - dumped)))
+
+
+if __name__ == "__main__":
+    vog = VOG()
+    vog.parse_vog_text(SAMPLE_VOG_TEXT)
+    executor = VOGExecutor(vog)
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 4), dtype=np.uint8)
+
+    executor.run(frame)
+    num_runs = 20
+    start = time.perf_counter()
+    for _ in range(num_runs):
+        executor.run(frame, pitch=10.0, yaw=45.0)
+    elapsed = time.perf_counter() - start
+    print(f"{num_runs / elapsed:.1f} VOG evaluations/sec, Dxyz shape {executor.output('Dxyz matrix').shape}")
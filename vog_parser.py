@@ -1,13 +1,16 @@
 from collections import defaultdict
+from itertools import groupby
 import json
-import re
+from pathlib import Path
 import textwrap
 
 import graphviz
-import numpy as np
-import matplotlib.pyplot as plt
 
-from matrix_viewer import show_matrix_as_heatmap, show_matrix_as_image, show_matrix_as_points
+from matrix_cache import cache_path_for, load_matrix
+from point_cloud import export_point_cloud, points_from_matrix
+from soar_print import iter_wmes
+from thumbnail_renderer import THUMBNAIL_CACHE_DIR, ThumbnailRenderer, render_thumbnail, thumbnail_key, thumbnail_path_for
+from treeview_reconciler import placeholder_row
 
 
 class Node(object):
@@ -20,37 +23,55 @@ class Node(object):
         self.parent_dict = {}
         self.attributes = defaultdict(list)
         self.matrix_metadata = {}
-        self.matrix = None
-        self.__needs_drawing = True
+        self.matrix_file = None
+        self._matrix = None
+        self.thumbnail_path = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None and self.matrix_file is not None:
+            self._matrix = load_matrix(self.matrix_file)
+            self.matrix_metadata["data_type"] = self._matrix.dtype.str
+            self.matrix_metadata["shape"] = self._matrix.shape
+        return self._matrix
+
+    def same_wmes(self, other):
+        return self.soar_id == other.soar_id and self.attributes == other.attributes
+
+    def update_from(self, other):
+        self.soar_id = other.soar_id
+        self.node_op = other.node_op
+        self.node_name = other.node_name
+        self.parent_dict = other.parent_dict
+        self.attributes = other.attributes
+
+    @property
+    def render_mode(self):
+        if self.node_op in ["save-to-file", "get-from-vsm"]:
+            return "image"
+        elif self.node_name in ["Dxyz matrix"]:
+            return "points"
+        return "heatmap"
     
     def load_matrix_data(self):
-        with open(f"node-{self.node_id}.json", "r") as node_file:
-            image_data = json.load(node_file)["Image Data"]
-            self.matrix_metadata["data_type"] = image_data['dt']
-            if len(self.matrix_metadata["data_type"]) > 1:
-                chans = int(self.matrix_metadata["data_type"][0])
-            else:
-                chans = 1
-            
-            self.matrix_metadata["shape"] = (image_data['rows'], image_data['cols'], chans)
-            self.matrix_metadata["raw_data"] = image_data['data']
-
-        self.matrix = np.array(self.matrix_metadata["raw_data"]).reshape(self.matrix_metadata["shape"])
-        self.__needs_drawing = True
-
-    def draw_matrix_data(self):
+        # The matrix itself is only read (through its memory-mapped .npy cache) once it is accessed
+        self.matrix_file = Path(f"node-{self.node_id}.json")
+        self._matrix = None
+
+    def draw_matrix_data(self, thumbnail_size=None):
         if self.matrix is None: return
-        if not self.__needs_drawing: return
 
-        if self.node_op in ["save-to-file", "get-from-vsm"]:
-            fig, axes = show_matrix_as_image(self.matrix)
-        elif self.node_name in ["Dxyz matrix"]:
-            fig, axes = show_matrix_as_points(self.matrix)
-        else:
-            fig, axes = show_matrix_as_heatmap(self.matrix)
-        fig.savefig(f"node-{self.node_id}.png")
-        plt.close(fig)
-        self.__needs_drawing = False
+        key = thumbnail_key(self.matrix, self.render_mode, thumbnail_size)
+        self.thumbnail_path = thumbnail_path_for(key)
+        if self.thumbnail_path.exists(): return
+
+        THUMBNAIL_CACHE_DIR.mkdir(exist_ok=True)
+        render_thumbnail(self.matrix, self.render_mode, self.thumbnail_path, thumbnail_size)
+
+    def export_points(self, out_path):
+        """Writes the node's full xyz matrix as a `.ply` or `.npz` point cloud, e.g. for the Dxyz matrix node."""
+        if self.matrix is None: return None
+        return export_point_cloud(out_path, points_from_matrix(self.matrix))
 
     @property
     def node_label(self):
@@ -68,7 +89,7 @@ class Node(object):
     </TR>
     <TR>
         <TD><I>{self.node_op}</I></TD>
-        <TD PORT="img" ROWSPAN="{len(attrs_list)+1}"><IMG SRC="node-{self.node_id}.png"/></TD>
+        <TD PORT="img" ROWSPAN="{len(attrs_list)+1}"><IMG SRC="{self.thumbnail_path or f'node-{self.node_id}.png'}"/></TD>
     </TR>"""
 
         if len(attrs_list) > 0:
@@ -82,25 +103,32 @@ class Node(object):
         return ret_str
 
 
-class VOG(object):
-    NODE_PATTERN = re.compile("\((\w\d+)(([ \n]+\^([!-~]+)[ \n]+([!-~ ]+))*)\)")
-    ATTRIBUTE_PATTERN = re.compile("\^([\w\d\-_]+)\s+([\w\d\-_*.]+|\|.*\|)")
-
+class VOGChanges(object):
+    """The node ids added, removed and changed by one `VOG.parse_vog_text` call."""
     def __init__(self):
+        self.added = set()
+        self.removed = set()
+        self.changed = set()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"VOGChanges(added={sorted(self.added)}, removed={sorted(self.removed)}, changed={sorted(self.changed)})"
+
+
+class VOG(object):
+    def __init__(self, thumbnail_size=None, max_render_workers=None):
         self.nodes = {-1: Node("V6")}
+        self.last_changes = VOGChanges()
+        self.thumbnail_renderer = ThumbnailRenderer(max_workers=max_render_workers, thumbnail_size=thumbnail_size)
     
     def parse_vog_text(self, vog_text):
-        node_matches = re.finditer(VOG.NODE_PATTERN, vog_text)
-        for node_match in node_matches:
-            soar_id = node_match[1]
-            node_attr_text = node_match[2].strip()
-            attr_matches = re.finditer(VOG.ATTRIBUTE_PATTERN, node_attr_text)
-
+        """Updates the graph in place from `print V6` output and returns the `VOGChanges` it caused."""
+        parsed_nodes = {}
+        for soar_id, wmes in groupby(iter_wmes(vog_text), key=lambda wme: wme[0]):
             node = Node(soar_id)
-            for attr_match in attr_matches:
-                attr_name = attr_match[1]
-                attr_val = attr_match[2]
-                
+            for _, attr_name, attr_val, _ in wmes:
                 if attr_name == "node-id": node.node_id = int(attr_val)
                 elif attr_name == "op-name": node.node_op = attr_val
                 elif attr_name == "node-name": node.node_name = attr_val.strip("|")
@@ -109,30 +137,97 @@ class VOG(object):
                 if attr_name in ["source", "a", "b", "template"]: node.parent_dict[attr_name] = int(attr_val)
                 if node.node_op == "save-to-file": node.node_name = "save node"
                 
-            self.nodes[node.node_id] = node
-        
+            parsed_nodes[node.node_id] = node
+
+        changes = VOGChanges()
+        for node_id, node in parsed_nodes.items():
+            if node_id not in self.nodes:
+                self.nodes[node_id] = node
+                changes.added.add(node_id)
+            elif not self.nodes[node_id].same_wmes(node):
+                self.nodes[node_id].update_from(node)
+                changes.changed.add(node_id)
+        for node_id in list(self.nodes):
+            if node_id != -1 and node_id not in parsed_nodes:
+                del self.nodes[node_id]
+                changes.removed.add(node_id)
+
+        self.last_changes = changes
+        if not changes: return changes
+
+        for n in self.nodes.values():
+            n.children = []
         for n_id, n in self.nodes.items():
             for p_id in n.parent_dict.values():
-                self.nodes[p_id].children.append(n_id)
+                if p_id in self.nodes and n_id not in self.nodes[p_id].children:
+                    self.nodes[p_id].children.append(n_id)
         
         node_key_dict = dict()
         for node_id, node in self.nodes.items():
             node_key_dict[node_id] = dict(node.attributes)
         with open("key.json", "w") as node_key_f:
             json.dump(node_key_dict, node_key_f)
+        return changes
+
+    def topological_order(self, include_save_nodes=False):
+        """Returns the node ids with every node after the nodes it reads from."""
+        node_ids = [n_id for n_id, n in self.nodes.items()
+                    if n_id != -1 and (include_save_nodes or n.node_op != "save-to-file")]
+        remaining_parents = {n_id: {p_id for p_id in self.nodes[n_id].parent_dict.values() if p_id != -1} for n_id in node_ids}
+        ready = sorted(n_id for n_id, parents in remaining_parents.items() if not parents)
+        order = []
+        while ready:
+            n_id = ready.pop(0)
+            order.append(n_id)
+            for child_id in sorted(self.nodes[n_id].children):
+                if child_id in remaining_parents and n_id in remaining_parents[child_id]:
+                    remaining_parents[child_id].discard(n_id)
+                    if not remaining_parents[child_id]:
+                        ready.append(child_id)
+        if len(order) != len(node_ids):
+            raise ValueError(f"VOG has a cycle or missing parents among nodes {sorted(set(node_ids) - set(order))}")
+        return order
+
+    def tree_rows(self, root_tree_id="-1", expanded=None):
+        """Yields `(tree_id, parent_tree_id, text, values)` rows for showing the VOG in a Treeview.
+
+        If `expanded` is given, only the attributes and save nodes of nodes whose tree id is in it are
+        listed, and the other nodes get a placeholder child instead.
+        """
+        op_nodes = [n for n_id, n in self.nodes.items() if n_id != -1 and n.node_op != "save-to-file"]
+        save_nodes = [n for n_id, n in self.nodes.items() if n_id != -1 and n.node_op == "save-to-file"]
+        for node in op_nodes + save_nodes:
+            tree_id = str(node.node_id)
+            parent_tree_id = root_tree_id
+            if node.node_op == "save-to-file" and node.parent_dict.get("source") in self.nodes:
+                parent_tree_id = str(node.parent_dict["source"])
+            if expanded is not None and parent_tree_id != root_tree_id and parent_tree_id not in expanded:
+                continue
+            yield tree_id, parent_tree_id, node.node_name, (node.node_op,)
+            if expanded is not None and tree_id not in expanded:
+                yield placeholder_row(tree_id)
+                continue
+            for attr, vals in node.attributes.items():
+                for i, v in enumerate(vals):
+                    yield f"{tree_id}^{attr}#{i}", tree_id, attr, (v,)
+
+    def draw_thumbnails(self, nodes):
+        for node in nodes:
+            node.load_matrix_data()
+        jobs = [(node.matrix, cache_path_for(node.matrix_file), node.render_mode) for node in nodes]
+        for node, thumbnail_path in zip(nodes, self.thumbnail_renderer.render(jobs)):
+            node.thumbnail_path = thumbnail_path
 
     def draw_graph(self, save_nodes=False, visuals=True):
         graph = graphviz.Digraph(comment="Visual Operation Graph",
                                  node_attr={'shape': 'none'},
                                  format="png",)
         graph.attr(rankdir='LR', ranksep="1.0", minlen="2")
-        for node_id, node in self.nodes.items():
-            if node_id == -1: continue
-            if node.node_op == "save-to-file" and not save_nodes: continue
-            if visuals:
-                node.load_matrix_data()
-                node.draw_matrix_data()
-            graph.node(str(node_id), node.node_label)
+        drawn_nodes = [n for n_id, n in self.nodes.items() if n_id != -1 and (save_nodes or n.node_op != "save-to-file")]
+        if visuals:
+            self.draw_thumbnails(drawn_nodes)
+        for node in drawn_nodes:
+            graph.node(str(node.node_id), node.node_label)
 
         for node_id, node in self.nodes.items():
             if node_id == -1: continue
@@ -144,8 +239,7 @@ class VOG(object):
 
 
 
-if __name__ == "__main__":
-    test_text = """(V6 ^node N42 ^node N41 ^node N40 ^node N39 ^node N38 ^node N37 ^node N36
+SAMPLE_VOG_TEXT = """(V6 ^node N42 ^node N41 ^node N40 ^node N39 ^node N38 ^node N37 ^node N36
        ^node N35 ^node N34 ^node N33 ^node N32 ^node N31 ^node N30 ^node N29
        ^node N28 ^node N27 ^node N26 ^node N25 ^node N24 ^node N23 ^node N22
        ^node N21 ^node N20 ^node N19 ^node N18 ^node N17 ^node N16 ^node N15
@@ -234,7 +328,9 @@ if __name__ == "__main__":
   (N1 ^fill-val 43.050000 ^node-id 0 ^node-name |Fh/2 matrix|
          ^op-name create-float-filled-mat ^size-x 640 ^size-y 480 ^source -1)
 """
-    
+
+
+if __name__ == "__main__":
     vog = VOG()
-    vog.parse_vog_text(test_text)
+    vog.parse_vog_text(SAMPLE_VOG_TEXT)
     vog.draw_graph()
\ No newline at end of file
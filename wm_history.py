@@ -0,0 +1,160 @@
+from wme_store import SymbolTable, WMEStore
+
+
+DEFAULT_KEYFRAME_INTERVAL = 64
+DEFAULT_MAX_CYCLES = 10000
+DEFAULT_MAX_STORED_WMES = 2000000
+
+# A WME is packed into one int: id symbol, attr symbol, value symbol, then the acceptable flag
+_ID_SHIFT = 65
+_ATTR_SHIFT = 33
+_VALUE_SHIFT = 1
+_SYMBOL_MASK = (1 << 32) - 1
+
+
+def pack_wme(id_sym, attr_sym, value_sym, is_acceptable) -> int:
+    return (id_sym << _ID_SHIFT) | (attr_sym << _ATTR_SHIFT) | (value_sym << _VALUE_SHIFT) | is_acceptable
+
+
+def unpack_wme(packed: int):
+    return packed >> _ID_SHIFT, (packed >> _ATTR_SHIFT) & _SYMBOL_MASK, (packed >> _VALUE_SHIFT) & _SYMBOL_MASK, bool(packed & 1)
+
+
+class WMHistory(object):
+    """Records the working memory of every decision cycle as a delta against the cycle before.
+
+    WMEs are packed into ints of symbols interned in the history's own `SymbolTable`, so each cycle
+    only costs its added and removed WMEs. Every `keyframe_interval`-th record also keeps the full
+    WME set, so rebuilding a cycle applies at most that many deltas. A keyframe and the deltas
+    after it form a segment. The oldest segments are evicted once more than `max_cycles` records,
+    or more than `max_stored_wmes` packed WMEs and symbols, are held. Symbols are reference counted
+    by the keyframes and deltas that use them and released with the last one, so values that
+    change every cycle, like ^world-time, do not outlive their segment.
+
+    Records are numbered from 0 in recording order and keep their number after eviction, from
+    `start` up to `end` (exclusive).
+    """
+    def __init__(self, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, max_cycles=DEFAULT_MAX_CYCLES,
+                 max_stored_wmes=DEFAULT_MAX_STORED_WMES):
+        self.symbols = SymbolTable()
+        self.refcounts = []
+        self.keyframe_interval = keyframe_interval
+        self.max_cycles = max(max_cycles, keyframe_interval)
+        self.max_stored_wmes = max_stored_wmes
+
+        self.start = 0
+        self.cycles = []
+        self.deltas = []
+        self.keyframes = {}
+        self.segment_sizes = []
+        self.packed_wmes = 0
+
+        self._latest = frozenset()
+        self._cached_record = None
+        self._cached_wmes = None
+
+    def __len__(self):
+        return len(self.cycles)
+
+    @property
+    def end(self):
+        return self.start + len(self.cycles)
+
+    @property
+    def stored_wmes(self):
+        """The packed WMEs held in keyframes and deltas plus the symbols they use, what the eviction cap counts."""
+        return self.packed_wmes + len(self.symbols)
+
+    def cycle_of(self, record) -> int:
+        return self.cycles[record - self.start]
+
+    def _intern_store(self, store: WMEStore) -> frozenset:
+        store_symbols = store.symbols.symbols
+        intern = self.symbols.intern
+        to_history = {}
+        for store_sym in set(store.ids) | set(store.attrs) | set(store.values):
+            to_history[store_sym] = intern(store_symbols[store_sym])
+        return frozenset(pack_wme(to_history[id_sym], to_history[attr_sym], to_history[value_sym], is_acceptable)
+                         for id_sym, attr_sym, value_sym, is_acceptable in zip(store.ids, store.attrs, store.values, store.acceptable))
+
+    def _reference(self, packed_wmes, change):
+        refcounts = self.refcounts
+        if len(refcounts) < len(self.symbols.symbols):
+            refcounts.extend([0] * (len(self.symbols.symbols) - len(refcounts)))
+        for packed in packed_wmes:
+            id_sym, attr_sym, value_sym, _ = unpack_wme(packed)
+            refcounts[id_sym] += change
+            refcounts[attr_sym] += change
+            refcounts[value_sym] += change
+
+    def _release_unreferenced(self, candidates):
+        for symbol_id in candidates:
+            if self.refcounts[symbol_id] == 0 and self.symbols.symbols[symbol_id] is not None:
+                self.symbols.release(symbol_id)
+
+    def record(self, cycle, store: WMEStore):
+        """Appends the WMEs in `store` as decision cycle `cycle`."""
+        wmes = self._intern_store(store)
+        record = self.end
+        if record % self.keyframe_interval == 0:
+            self.keyframes[record] = wmes
+            self.deltas.append(((), ()))
+            self._reference(wmes, 1)
+            self.segment_sizes.append(len(wmes))
+            self.packed_wmes += len(wmes)
+        else:
+            added = tuple(wmes - self._latest)
+            removed = tuple(self._latest - wmes)
+            self.deltas.append((added, removed))
+            self._reference(added, 1)
+            self._reference(removed, 1)
+            self.segment_sizes[-1] += len(added) + len(removed)
+            self.packed_wmes += len(added) + len(removed)
+        self.cycles.append(cycle)
+        self._latest = wmes
+        self._evict()
+
+    def _evict(self):
+        while len(self.segment_sizes) > 1 and (len(self.cycles) > self.max_cycles or self.stored_wmes > self.max_stored_wmes):
+            keyframe = self.keyframes.pop(self.start)
+            self._reference(keyframe, -1)
+            candidates = {symbol_id for packed in keyframe for symbol_id in unpack_wme(packed)[:3]}
+            for added, removed in self.deltas[:self.keyframe_interval]:
+                for packed_wmes in (added, removed):
+                    self._reference(packed_wmes, -1)
+                    candidates.update(symbol_id for packed in packed_wmes for symbol_id in unpack_wme(packed)[:3])
+            del self.cycles[:self.keyframe_interval]
+            del self.deltas[:self.keyframe_interval]
+            self.packed_wmes -= self.segment_sizes.pop(0)
+            self.start += self.keyframe_interval
+            self._release_unreferenced(candidates)
+            self._cached_record = self._cached_wmes = None
+
+    def wmes_at(self, record) -> frozenset:
+        """Returns the packed WMEs of `record`, applying deltas from the closest keyframe or the last rebuilt record."""
+        if not self.start <= record < self.end:
+            raise IndexError(f"Record {record} is not in the history, which holds records {self.start} to {self.end - 1}")
+        if record == self.end - 1:
+            return self._latest
+        keyframe = record - record % self.keyframe_interval
+        cached = self._cached_record
+        if cached is not None and keyframe <= cached <= record:
+            first, wmes = cached + 1, set(self._cached_wmes)
+        else:
+            first, wmes = keyframe + 1, set(self.keyframes[keyframe])
+        for added, removed in self.deltas[first - self.start:record + 1 - self.start]:
+            wmes.difference_update(removed)
+            wmes.update(added)
+        wmes = frozenset(wmes)
+        self._cached_record, self._cached_wmes = record, wmes
+        return wmes
+
+    def store_at(self, record) -> WMEStore:
+        """Rebuilds `record` as a `WMEStore` with its own symbol table, each id's WMEs in symbol id order."""
+        store = WMEStore()
+        symbols = self.symbols.symbols
+        store.extend(
+            (symbols[id_sym], symbols[attr_sym], symbols[value_sym], is_acceptable)
+            for id_sym, attr_sym, value_sym, is_acceptable in map(unpack_wme, sorted(self.wmes_at(record)))
+        )
+        return store
@@ -0,0 +1,187 @@
+from array import array
+from collections import defaultdict
+
+
+# A store that owns its symbol table starts a fresh one on clear() once the table holds this many
+# times more symbols than the store held WMEs, so per-cycle values like ^world-time cannot pile up
+SYMBOL_TABLE_SLACK = 4
+MIN_SYMBOL_TABLE_RESET = 4096
+
+
+class SymbolTable(object):
+    """Interns strings as small ints. Ids stay valid until the symbol is released or, for a table a `WMEStore` created itself, the store resets it."""
+    def __init__(self):
+        self.symbols = []
+        self.ids = {}
+        self.free_ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, symbol: str) -> int:
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            if self.free_ids:
+                symbol_id = self.free_ids.pop()
+                self.symbols[symbol_id] = symbol
+            else:
+                symbol_id = len(self.symbols)
+                self.symbols.append(symbol)
+            self.ids[symbol] = symbol_id
+        return symbol_id
+
+    def release(self, symbol_id: int):
+        """Forgets a symbol so its id can be reused. The caller must know nothing refers to it any more."""
+        del self.ids[self.symbols[symbol_id]]
+        self.symbols[symbol_id] = None
+        self.free_ids.append(symbol_id)
+
+    def lookup(self, symbol: str):
+        """Returns the id of `symbol`, or None if it was never interned."""
+        return self.ids.get(symbol)
+
+    def __getitem__(self, symbol_id: int) -> str:
+        return self.symbols[symbol_id]
+
+
+class WMEStore(object):
+    """Stores `(id, attr, value)` WMEs as three parallel int arrays of interned symbols.
+
+    WMEs are indexed by id as they are added. The attribute, value and `(attr, value)` indexes are
+    built on the first query after a change, so questions such as "which ids have ^op-name
+    mul-mats" or "what points at V5" are dict lookups rather than scans, without slowing down
+    parsing when nothing asks them. The public methods take and return strings.
+    """
+    def __init__(self, symbols: SymbolTable = None):
+        self.owns_symbols = symbols is None
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.ids = array("I")
+        self.attrs = array("I")
+        self.values = array("I")
+        self.acceptable = array("B")
+        self.by_id = {}
+        self._by_attr = None
+        self._by_value = None
+        self._by_attr_value = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def clear(self):
+        if self.owns_symbols and len(self.symbols) > max(MIN_SYMBOL_TABLE_RESET, SYMBOL_TABLE_SLACK * len(self.ids)):
+            self.symbols = SymbolTable()
+        for column in [self.ids, self.attrs, self.values, self.acceptable]:
+            del column[:]
+        self.by_id.clear()
+        self._invalidate_indexes()
+
+    def _invalidate_indexes(self):
+        self._by_attr = None
+        self._by_value = None
+        self._by_attr_value = None
+
+    def add(self, soar_id, attr, value, is_acceptable=False):
+        self.extend([(soar_id, attr, value, is_acceptable)])
+
+    def extend(self, wmes):
+        """Adds `(id, attr, value, is_acceptable)` tuples, e.g. straight from `soar_print.iter_wmes`."""
+        symbol_ids = self.symbols.ids
+        intern = self.symbols.intern
+        by_id = self.by_id
+        append_id, append_attr, append_value = self.ids.append, self.attrs.append, self.values.append
+        append_acceptable = self.acceptable.append
+        wme = len(self.ids)
+        for soar_id, attr, value, is_acceptable in wmes:
+            id_sym = symbol_ids.get(soar_id)
+            if id_sym is None:
+                id_sym = intern(soar_id)
+            attr_sym = symbol_ids.get(attr)
+            if attr_sym is None:
+                attr_sym = intern(attr)
+            value_sym = symbol_ids.get(value)
+            if value_sym is None:
+                value_sym = intern(value)
+            append_id(id_sym)
+            append_attr(attr_sym)
+            append_value(value_sym)
+            append_acceptable(is_acceptable)
+            id_wmes = by_id.get(id_sym)
+            if id_wmes is None:
+                by_id[id_sym] = [wme]
+            else:
+                id_wmes.append(wme)
+            wme += 1
+        self._invalidate_indexes()
+
+    def _build_indexes(self):
+        by_attr = defaultdict(list)
+        by_value = defaultdict(list)
+        by_attr_value = defaultdict(list)
+        for wme, (attr_sym, value_sym) in enumerate(zip(self.attrs, self.values)):
+            by_attr[attr_sym].append(wme)
+            by_value[value_sym].append(wme)
+            by_attr_value[(attr_sym, value_sym)].append(wme)
+        self._by_attr = dict(by_attr)
+        self._by_value = dict(by_value)
+        self._by_attr_value = dict(by_attr_value)
+
+    @property
+    def by_attr(self):
+        if self._by_attr is None:
+            self._build_indexes()
+        return self._by_attr
+
+    @property
+    def by_value(self):
+        if self._by_value is None:
+            self._build_indexes()
+        return self._by_value
+
+    @property
+    def by_attr_value(self):
+        if self._by_attr_value is None:
+            self._build_indexes()
+        return self._by_attr_value
+
+    def wme(self, wme):
+        symbols = self.symbols.symbols
+        return symbols[self.ids[wme]], symbols[self.attrs[wme]], symbols[self.values[wme]], bool(self.acceptable[wme])
+
+    def __iter__(self):
+        return (self.wme(wme) for wme in range(len(self.ids)))
+
+    def is_identifier(self, symbol) -> bool:
+        """Whether `symbol` has WMEs of its own, i.e. was printed as an identifier."""
+        return self.symbols.lookup(symbol) in self.by_id
+
+    def identifiers(self):
+        return [self.symbols[id_sym] for id_sym in self.by_id]
+
+    def wmes_of(self, soar_id):
+        """Returns the `(attr, value)` pairs of `soar_id` in print order."""
+        symbols = self.symbols.symbols
+        attrs, values = self.attrs, self.values
+        return [(symbols[attrs[wme]], symbols[values[wme]])
+                for wme in self.by_id.get(self.symbols.lookup(soar_id), [])]
+
+    def values_of(self, soar_id, attr):
+        symbols = self.symbols.symbols
+        attr_sym = self.symbols.lookup(attr)
+        return [symbols[self.values[wme]] for wme in self.by_id.get(self.symbols.lookup(soar_id), [])
+                if self.attrs[wme] == attr_sym]
+
+    def ids_with(self, attr, value=None):
+        """Returns the ids with an `^attr` WME, or with `^attr value` if `value` is given, without duplicates."""
+        attr_sym = self.symbols.lookup(attr)
+        if value is None:
+            wmes = self.by_attr.get(attr_sym, [])
+        else:
+            wmes = self.by_attr_value.get((attr_sym, self.symbols.lookup(value)), [])
+        symbols = self.symbols.symbols
+        return list(dict.fromkeys(symbols[self.ids[wme]] for wme in wmes))
+
+    def parents_of(self, value):
+        """Returns the `(id, attr)` of every WME whose value is `value`."""
+        symbols = self.symbols.symbols
+        return [(symbols[self.ids[wme]], symbols[self.attrs[wme]])
+                for wme in self.by_value.get(self.symbols.lookup(value), [])]